@@ -0,0 +1,75 @@
+"""
+Compares the single-pass box score counting in Utility with the old per player x per type loops
+on large synthetic matches, and checks that both give the same frames.
+
+Run from the repository root: python -m benchmarks.bench_box_score
+"""
+import timeit
+import pandas as pd
+from benchmarks.synthetic import match, write_match
+from logic.dictionary import Dictionary
+from logic.storage import MemoryStorage
+from logic.utility import Utility
+
+
+def legacy_shooting_stat(events, dict_players, dict_teams, match_id):
+    df = events.loc[events.MatchEventType == 'Shot'][['ShotResult', 'Player']]
+    list_all_rows = []
+    for player_id in dict_players.keys():
+        counts = {}
+        for shot, column in Dictionary.shot_stat_column.items():
+            f = (df.ShotResult == shot) & (df.Player == player_id)
+            counts[column] = f.sum()
+        list_all_rows.append([player_id] + [counts[c] for c in ["Made2", "Missed2", "Made1", "Missed1", "Made3", "Missed3"]])
+    shot_df = pd.DataFrame.from_records(list_all_rows, columns=["Player", "Made2", "Missed2", "Made1", "Missed1", "Made3", "Missed3"])
+    shot_df['PlayerName'] = shot_df.Player.replace(dict_players)
+    shot_df['Team'] = shot_df.Player.replace(dict_teams)
+    shot_df['MatchId'] = match_id
+    return shot_df
+
+
+def legacy_non_shooting_stat(events, dict_players, dict_teams, match_id):
+    event_type = Dictionary.non_shooting_event_types
+    df = events.loc[events.MatchEventType.isin(event_type)]
+    list_all_rows = []
+    for player_id in dict_players.keys():
+        list_all_rows.append([player_id] + [((df.MatchEventType == e) & (df.Player == player_id)).sum() for e in event_type])
+    non_shot_df = pd.DataFrame.from_records(list_all_rows, columns=['Player'] + event_type)
+    non_shot_df['PlayerName'] = non_shot_df.Player.replace(dict_players)
+    non_shot_df['Team'] = non_shot_df.Player.replace(dict_teams)
+    non_shot_df['MatchId'] = match_id
+
+    assists = events.loc[events.Assist != 0][['Player', 'Assist']].groupby('Assist').count().reset_index()
+    fouls = events.loc[events.FoulType != 0][['Player', 'FoulType']].groupby('Player').count().reset_index()
+    assist_df = pd.DataFrame.from_records(
+        [[p, int(assists.loc[assists.Assist == p].Player.sum())] for p in dict_players], columns=['Player', 'Assist'])
+    foul_df = pd.DataFrame.from_records(
+        [[p, int(fouls.loc[fouls.Player == p].FoulType.sum())] for p in dict_players], columns=['Player', 'Foul'])
+    return pd.merge(pd.merge(non_shot_df, assist_df), foul_df)
+
+
+def main(events_per_period=2000, number=3):
+    storage = MemoryStorage()
+    summary, data = match(1, overtimes=2, events_per_period=events_per_period)
+    write_match(storage, 1, summary, data)
+    utility = Utility(match_id=1, storage=storage)
+    events = utility.get_events()
+    dict_players = utility.dict_player_fullname()
+    dict_teams = utility.dict_player_team()
+
+    shooting = legacy_shooting_stat(events, dict_players, dict_teams, 1)
+    non_shooting = legacy_non_shooting_stat(events, dict_players, dict_teams, 1)
+    pd.testing.assert_frame_equal(shooting, utility.get_shooting_stat())
+    pd.testing.assert_frame_equal(non_shooting, utility.get_non_shooting_stat())
+
+    legacy = timeit.timeit(lambda: (legacy_shooting_stat(events, dict_players, dict_teams, 1),
+                                    legacy_non_shooting_stat(events, dict_players, dict_teams, 1)),
+                           number=number) / number
+    kernel = timeit.timeit(lambda: utility._Utility__box_score_counts(events), number=number) / number
+    print("Match: {} events, {} players".format(len(events), len(dict_players)))
+    print("per player loops: {:.3f}s".format(legacy))
+    print("single pass:      {:.3f}s ({:.1f}x)".format(kernel, legacy / kernel))
+
+
+if __name__ == '__main__':
+    main()
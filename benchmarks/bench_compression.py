@@ -0,0 +1,54 @@
+"""
+Size and time trade-off of the compression methods on a staging events file
+and on a season of player_stat json lines files.
+
+Run from the repository root: python -m benchmarks.bench_compression
+"""
+import json
+import random
+import timeit
+from benchmarks.bench_nor_char import events_payload
+from logic.compression import compress, decompress, zstandard
+
+
+def player_stat_lines(no_matches=200, seed=0):
+    """
+    :return: one json lines text per match, shaped like the files in the player_stat folder
+    """
+    rnd = random.Random(seed)
+    files = []
+    for match_id in range(no_matches):
+        rows = []
+        for player_id in range(24):
+            row = {'MatchId': match_id, 'PlayerId': player_id, 'HomeAway': rnd.choice(['Home', 'Away']),
+                   'Team': 'Team ' + str(player_id % 2), 'Player': 'Player ' + str(player_id), 'MIN': 'P0DT0H21M13S'}
+            for stat in ['Points', '2FGM', '2FGA', '3FGM', '3FGA', 'FTM', 'FTA', 'DREB', 'OREB', 'REB', 'AST',
+                         'STL', 'TOV', 'BLK', 'FLS', 'Efficiency']:
+                row[stat] = rnd.randint(0, 12)
+            row['Starter'] = rnd.choice(['*', ''])
+            rows.append(json.dumps(row, ensure_ascii=False))
+        files.append('\n'.join(rows).encode('utf-8'))
+    return files
+
+
+def measure(name, files, method, number=3):
+    compressed = [compress(body, method)[0] for body in files]
+    write = timeit.timeit(lambda: [compress(body, method) for body in files], number=number) / number
+    read = timeit.timeit(lambda: [decompress(body) for body in compressed], number=number) / number
+    raw_size = sum(len(body) for body in files)
+    size = sum(len(body) for body in compressed)
+    print("{:<12} {:<5} {:>10.0f} kB {:>6.1f}x  compress {:.3f}s  decompress {:.3f}s".format(
+        name, method, size / 1e3, raw_size / size, write, read))
+
+
+def main():
+    datasets = {'events': [events_payload(1500, seed=i).encode('utf-8') for i in range(20)],
+                'player_stat': player_stat_lines()}
+    methods = ['none', 'gzip'] + (['zstd'] if zstandard is not None else [])
+    for name, files in datasets.items():
+        for method in methods:
+            measure(name, files, method)
+
+
+if __name__ == '__main__':
+    main()
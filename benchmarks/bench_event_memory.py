@@ -0,0 +1,69 @@
+"""
+Memory of a full season of events held at once, with the old object/int64 event frame and the compact
+categorical/narrow int frame built by Utility, and the speed of the masks the analyses use on both.
+
+Run from the repository root: python -m benchmarks.bench_event_memory
+"""
+import timeit
+import pandas as pd
+from benchmarks.synthetic import match
+from logic.storage import MemoryStorage
+from logic.utility import Utility
+
+
+def legacy_event(data):
+    """
+    Event frame as it was built before: every column kept, text as python strings, clock as int64
+    """
+    events = pd.DataFrame(data['Events']).fillna(0)
+    events = events.loc[events.PeriodTime != '']
+    events['Team'] = events['Team'].replace({'B': 'Away', 'H': 'Home'})
+    convert_cols = ['Assist', 'Player', 'PlayerIn', 'PlayerOut', 'ShotResult', 'FoulType']
+    events[convert_cols] = events[convert_cols].astype('int64')
+    events = events.rename(columns={'Team': 'HomeAway'})
+    period = events.PeriodName.str.extract(r'^(\d+)\. (periode|ekstraomgang)$')
+    events['Period'] = period[0].astype('int64') + (period[1] == 'ekstraomgang') * 4
+    period_time = events.PeriodTime.str.split(':', n=1, expand=True).astype('int64')
+    events['GameSecond'] = (events.Period.clip(upper=5) - 1) * 600 + (events.Period - 5).clip(lower=0) * 300 + \
+        period_time[0] * 60 + period_time[1]
+    events['MinuteRound'] = (events.GameSecond + 59) // 60
+    return events
+
+
+def season(no_matches):
+    for match_id in range(1, no_matches + 1):
+        yield match(match_id, overtimes=int(match_id % 10 == 0))[1]
+
+
+def masks(events):
+    return ((events.MatchEventType == 'Shot') & (events.HomeAway == 'Home')).sum() + \
+        (events.MatchEventType.isin(['DefensiveRebound', 'OffensiveRebound'])).sum()
+
+
+def main(no_matches=180, number=20):
+    utility = Utility(storage=MemoryStorage())
+    legacy_frames = []
+    compact_frames = []
+    for data in season(no_matches):
+        legacy_frames.append(legacy_event(data))
+        compact_frames.append(utility._Utility__event(data))
+    legacy = pd.concat(legacy_frames, ignore_index=True)
+    compact = pd.concat(compact_frames, ignore_index=True)
+    # categories differ between matches, so concat falls back to object: categorize the season frame again
+    for column in ['MatchEventType', 'PeriodName', 'HomeAway']:
+        compact[column] = compact[column].astype('category')
+    assert masks(legacy) == masks(compact)
+
+    legacy_mb = legacy.memory_usage(deep=True).sum() / 1e6
+    compact_mb = compact.memory_usage(deep=True).sum() / 1e6
+    legacy_time = timeit.timeit(lambda: masks(legacy), number=number) / number
+    compact_time = timeit.timeit(lambda: masks(compact), number=number) / number
+    print("Season: {} matches, {} events".format(no_matches, len(compact)))
+    print("object/int64 frame:       {:7.1f} MB  masks {:.4f}s".format(legacy_mb, legacy_time))
+    print("categorical/narrow frame: {:7.1f} MB  masks {:.4f}s".format(compact_mb, compact_time))
+    print("{:.1f}x less memory, {:.1f}x faster masks".format(legacy_mb / compact_mb, legacy_time / compact_time))
+    print(compact.dtypes.to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Compares the single-pass norwegian character repair with the old str()/replace/eval round trip
+on a large events payload, and checks that both give the same result.
+
+Run from the repository root: python -m benchmarks.bench_nor_char
+"""
+import json
+import random
+import timeit
+from functools import reduce
+from logic.dictionary import Dictionary
+from logic.nor_char import repair_nor_chars
+
+
+def legacy_convert_to_nor_char(d):
+    rep = {"&#248;": "ø",
+           "\u00f8": "ø",
+           "&#229;": "å",
+           "Ã¸": 'ø',
+           "Ã˜": "Ø",
+           "Ã¥": "å",
+           "Ã¦": "æ",
+           "Ã©": "é"}
+    replaced_dict = reduce(lambda a, kv: a.replace(*kv), rep.items(), str(d))
+    return eval(replaced_dict)
+
+
+def events_payload(no_events, seed=0):
+    """
+    :return: json text of an events view model with broken norwegian characters in names and period names
+    """
+    rnd = random.Random(seed)
+    broken = list(Dictionary.nor_char_replacement.keys())
+    names = ['Bj' + rnd.choice(broken) + 'rn', 'S' + rnd.choice(broken) + 'ren', 'Kn' + rnd.choice(broken) + 't', 'Ola']
+    events = [{'MatchEventType': rnd.choice(['Shot', 'Foul', 'Turnover', 'Substitution']),
+               'PeriodName': '{}. periode'.format(rnd.randint(1, 4)),
+               'PeriodTime': '{:02d}:{:02d}'.format(rnd.randint(0, 9), rnd.randint(0, 59)),
+               'Description': rnd.choice(names) + ' ' + rnd.choice(names),
+               'Player': rnd.randint(100000, 999999)}
+              for _ in range(no_events)]
+    players = [{'Id': i, 'FirstName': rnd.choice(names), 'LastName': rnd.choice(names)} for i in range(30)]
+    return json.dumps({'Events': events, 'HomePlayers': players, 'AwayPlayers': players}, ensure_ascii=False)
+
+
+def main(no_events=50000, number=5):
+    text = events_payload(no_events)
+    assert legacy_convert_to_nor_char(json.loads(text)) == json.loads(repair_nor_chars(text))
+    assert repair_nor_chars(text.encode('utf-8')) == repair_nor_chars(text).encode('utf-8')
+
+    legacy = timeit.timeit(lambda: legacy_convert_to_nor_char(json.loads(text)), number=number) / number
+    single_pass = timeit.timeit(lambda: json.loads(repair_nor_chars(text)), number=number) / number
+    print("Payload: {} events, {:.1f} MB".format(no_events, len(text.encode('utf-8')) / 1e6))
+    print("str/replace/eval: {:.3f}s".format(legacy))
+    print("single pass:      {:.3f}s ({:.1f}x)".format(single_pass, legacy / single_pass))
+
+
+if __name__ == '__main__':
+    main()
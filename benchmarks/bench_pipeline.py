@@ -0,0 +1,173 @@
+"""
+Time of every stage of Utility and every Analysis method on synthetic matches in a MemoryStorage:
+one match of each profile in benchmarks.synthetic, and a whole season analysed like the season runner does.
+The report is saved as json, and a report of another commit can be given to compare against.
+
+Run from the repository root:
+python -m benchmarks.bench_pipeline --output pipeline.json [--compare pipeline_before.json]
+"""
+import argparse
+import contextlib
+import io
+import json
+import platform
+import subprocess
+import time
+import pandas as pd
+from benchmarks.synthetic import PROFILES, match, season, write_match
+from logic.analysis import Analysis
+from logic.storage import MemoryStorage
+from logic.utility import Utility, load_batch, prefetch_staging_files
+
+ANALYSIS_METHODS = ['match_header', 'point_accumulation', 'assist', 'scoring', 'player_statistic',
+                    'team_fouls_per_period', 'lineups']
+
+
+def best_of(function, repeat):
+    """
+    :return: shortest time of repeat calls in seconds, the least disturbed by the rest of the machine
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def utility_stages(utility, prefetched):
+    """
+    :param prefetched: staging files of the match, the parse stages read them again on every call
+    :return: dictionary with stage name and a function running it on the state of the built utility
+    """
+    events = utility.get_events()
+
+    def parse_summary_file():
+        utility._Utility__prefetched = dict(prefetched)
+        utility._Utility__parse_summary_file()
+
+    def parse_events_file():
+        utility._Utility__prefetched = dict(prefetched)
+        return utility._Utility__parse_events_file()
+
+    data = parse_events_file()
+    teams = utility.get_team_names()
+    return {'parse_summary_file': parse_summary_file,
+            'parse_events_file': parse_events_file,
+            'event': lambda: utility._Utility__event(data),
+            'roster': lambda: utility._Utility__roster(data, teams['Home'], teams['Away']),
+            'box_score_counts': lambda: utility._Utility__box_score_counts(events),
+            'shooting_stat': lambda: utility._Utility__shooting_stat(events),
+            'non_shooting_stat': lambda: utility._Utility__non_shooting_stat(events),
+            # the result is kept in an attribute with the same name as the method, so it is called on the class
+            'players_all_playtimes': lambda: Utility._Utility__players_all_playtimes(utility, events),
+            'event_lineups': lambda: utility._Utility__event_lineups(events)}
+
+
+def single_match(profile, repeat):
+    """
+    :return: rows and events of the match, best time of every Utility stage and Analysis method
+    """
+    storage = MemoryStorage()
+    summary, data = match(1, **PROFILES[profile])
+    write_match(storage, 1, summary, data)
+    prefetched = prefetch_staging_files([1], storage=storage)[0][1]
+    utility = Utility(match_id=1, storage=storage, prefetched=dict(prefetched))
+    analysis = Analysis(1, storage=storage, utility=utility)
+
+    seconds = {}
+    for stage, function in utility_stages(utility, prefetched).items():
+        seconds['Utility.' + stage] = best_of(function, repeat)
+    seconds['Utility'] = best_of(lambda: Utility(match_id=1, storage=storage, prefetched=dict(prefetched)), repeat)
+    seconds['Analysis.__init__'] = best_of(lambda: Analysis(1, storage=storage, utility=utility), repeat)
+    for method in ANALYSIS_METHODS:
+        seconds['Analysis.' + method] = best_of(getattr(analysis, method), repeat)
+    seconds['Analysis.run_all_analyses'] = best_of(analysis.run_all_analyses, repeat)
+    return {'Events': len(data['Events']), 'Rows': len(utility.get_events()), 'Seconds': seconds}
+
+
+def season_scale(no_matches):
+    """
+    Loads and analyses a season in this process with dry_run, so only the pipeline itself is timed
+    :return: number of matches of every profile, total time of the stages and matches per second
+    """
+    storage = MemoryStorage()
+    profiles = {}
+    no_events = 0
+    for match_id, profile, summary, data in season(no_matches):
+        write_match(storage, match_id, summary, data)
+        profiles[profile] = profiles.get(profile, 0) + 1
+        no_events += len(data['Events'])
+
+    list_match_id = list(range(1, no_matches + 1))
+    start = time.perf_counter()
+    dict_utility, _ = load_batch(list_match_id, storage=storage)
+    load_seconds = time.perf_counter() - start
+    analysis_start = time.perf_counter()
+    for match_id in list_match_id:
+        Analysis(match_id, storage=storage, utility=dict_utility[match_id]).run_all_analyses()
+    analysis_seconds = time.perf_counter() - analysis_start
+    total = time.perf_counter() - start
+    return {'Matches': no_matches, 'Events': no_events, 'Profiles': profiles,
+            'Seconds': {'load_batch': load_seconds, 'run_all_analyses': analysis_seconds, 'total': total},
+            'MatchesPerSecond': no_matches / total}
+
+
+def commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, previous):
+    """
+    Prints the time of every stage against the same stage in a previous report
+    """
+    print("{:45} {:>10} {:>10} {:>7}".format('stage', 'before ms', 'now ms', 'ratio'))
+    for profile, result in report['SingleMatch'].items():
+        before = previous.get('SingleMatch', {}).get(profile, {}).get('Seconds', {})
+        for stage, seconds in result['Seconds'].items():
+            if stage in before:
+                print("{:45} {:10.2f} {:10.2f} {:6.2f}x".format(
+                    profile + ' ' + stage, before[stage] * 1000, seconds * 1000, before[stage] / seconds))
+    if 'Season' in previous:
+        print("season matches/s: {:.2f} -> {:.2f}".format(previous['Season']['MatchesPerSecond'],
+                                                          report['Season']['MatchesPerSecond']))
+
+
+def main(no_matches=100, repeat=5, output=None, previous=None):
+    report = {'Commit': commit(), 'Python': platform.python_version(), 'Pandas': pd.__version__,
+              'Repeat': repeat, 'SingleMatch': {}}
+    with contextlib.redirect_stdout(io.StringIO()):  # Utility and Analysis print every step
+        for profile in PROFILES:
+            report['SingleMatch'][profile] = single_match(profile, repeat)
+        report['Season'] = season_scale(no_matches)
+
+    for profile, result in report['SingleMatch'].items():
+        print("{} ({} events)".format(profile, result['Events']))
+        for stage, seconds in result['Seconds'].items():
+            print("    {:35} {:8.2f} ms".format(stage, seconds * 1000))
+    season_report = report['Season']
+    print("Season: {} matches, {} events, load {:.2f}s, analyses {:.2f}s, {:.2f} matches/s".format(
+        season_report['Matches'], season_report['Events'], season_report['Seconds']['load_batch'],
+        season_report['Seconds']['run_all_analyses'], season_report['MatchesPerSecond']))
+
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if previous:
+        with open(previous) as f:
+            compare(report, json.load(f))
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the Utility stages and the Analysis methods")
+    parser.add_argument('--matches', type=int, default=100, help="number of matches in the season")
+    parser.add_argument('--repeat', type=int, default=5, help="runs of every stage, the shortest counts")
+    parser.add_argument('--output', help="file the json report is saved to")
+    parser.add_argument('--compare', help="json report of an earlier run to compare against")
+    args = parser.parse_args()
+    main(no_matches=args.matches, repeat=args.repeat, output=args.output, previous=args.compare)
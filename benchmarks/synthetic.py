@@ -0,0 +1,139 @@
+"""
+Seeded generator of synthetic play-by-play data shaped like the MatchSummaryViewModel and
+MatchEventsViewModel files in STAGING_IN, so the pipeline can be run and timed without S3.
+"""
+import json
+import random
+from logic.dictionary import Dictionary
+
+PERIOD_NAMES = ['1. periode', '2. periode', '3. periode', '4. periode',
+                '1. ekstraomgang', '2. ekstraomgang', '3. ekstraomgang']
+FIRST_NAMES = ['Bjørn', 'Søren', 'Håkon', 'Ola', 'Kari', 'Ærlig', 'Jørgen', 'Åse', 'Per', 'Siri', 'Nils', 'Ingrid']
+LAST_NAMES = ['Hansen', 'Johansen', 'Olsen', 'Larsen', 'Andersen', 'Pedersen', 'Nilsen', 'Kristiansen', 'Sæther']
+MADE = {1: 200444, 2: 200443, 3: 200442}
+MISSED = {1: 200445, 2: 200581, 3: 200580}
+FOUL_TYPES = [int(float(foul_type)) for foul_type in Dictionary.foul_description]
+# kinds of games the pipeline has to handle, as arguments of match()
+PROFILES = {'regular': {},
+            'overtime': {'overtimes': 1},
+            'double_overtime': {'overtimes': 2},
+            'heavy_substitution': {'substitution_rate': 0.25, 'substitution_batch': 3, 'top_substitutions': True},
+            'foul_heavy': {'foul_rate': 0.3, 'events_per_period': 140}}
+# share of every profile in a generated season
+SEASON_MIX = {'regular': 0.6, 'overtime': 0.12, 'double_overtime': 0.04, 'heavy_substitution': 0.12, 'foul_heavy': 0.12}
+
+
+def roster(rnd, first_id, team, no_players=12):
+    players = []
+    for i in range(no_players):
+        players.append({'Id': first_id + i, 'FirstName': rnd.choice(FIRST_NAMES), 'LastName': rnd.choice(LAST_NAMES),
+                        'ShirtNo': str(4 + i), 'IsCaptain': i == 0, 'IsCoach': False})
+    # coaching staff has no shirt number
+    players.append({'Id': first_id + no_players, 'FirstName': 'Coach', 'LastName': team, 'ShirtNo': None,
+                    'IsCaptain': False, 'IsCoach': True})
+    return players
+
+
+def match(match_id, seed=0, overtimes=0, events_per_period=110, substitution_rate=0.08, substitution_batch=1,
+          foul_rate=0.1, top_substitutions=False, date='2020-02-01T18:00:00'):
+    """
+    :param overtimes: number of overtime periods after the four regular periods
+    :param events_per_period: number of events in a 10 minute period, overtimes get half
+    :param substitution_rate: share of the events that are substitutions
+    :param substitution_batch: maximum number of players a team changes at the same time
+    :param foul_rate: share of the events that are fouls
+    :param top_substitutions: if True, the events start with substitutions at 00:00 like some real files do
+    :return: summary and events view models as dictionaries
+    """
+    rnd = random.Random(seed * 1000003 + match_id)
+    teams = {'H': 'Home Team {}'.format(match_id % 7), 'B': 'Away Team {}'.format(match_id % 5)}
+    players = {'H': roster(rnd, 100000 + 1000 * (match_id % 50), teams['H']),
+               'B': roster(rnd, 500000 + 1000 * (match_id % 50), teams['B'])}
+    on_court = {team: [p['Id'] for p in players[team][:5]] for team in players}
+    bench = {team: [p['Id'] for p in players[team][5:-1]] for team in players}
+    score = {'H': 0, 'B': 0}
+    periods = []
+    events = []
+
+    def event(event_type, period_name, seconds, team, **values):
+        row = {'MatchEventType': event_type, 'PeriodName': period_name,
+               'PeriodTime': '{:02d}:{:02d}'.format(seconds // 60, seconds % 60), 'Team': team,
+               'Player': None, 'PlayerIn': None, 'PlayerOut': None, 'Assist': None, 'ShotResult': None,
+               'FoulType': None, 'Description': ''}
+        row.update(values)
+        events.append(row)
+
+    if top_substitutions:
+        for team in players:
+            event('Substitution', PERIOD_NAMES[0], 0, team, PlayerIn=on_court[team][0], PlayerOut=on_court[team][0])
+
+    for period in range(4 + overtimes):
+        period_name = PERIOD_NAMES[period]
+        length = 600 if period < 4 else 300
+        no_events = events_per_period if period < 4 else events_per_period // 2
+        score_at_start = dict(score)
+        times = sorted(rnd.randint(1, length - 1) for _ in range(no_events))
+        for seconds in times:
+            team = rnd.choice(['H', 'B'])
+            other = 'B' if team == 'H' else 'H'
+            player = rnd.choice(on_court[team])
+            draw = rnd.random()
+            if draw < substitution_rate:
+                players_out = [player]
+                if substitution_batch > 1:
+                    others = [p for p in on_court[team] if p != player]
+                    players_out += rnd.sample(others, rnd.randint(0, substitution_batch - 1))
+                for player_out in players_out:
+                    player_in = bench[team].pop(rnd.randrange(len(bench[team])))
+                    on_court[team].remove(player_out)
+                    on_court[team].append(player_in)
+                    bench[team].append(player_out)
+                    event('Substitution', period_name, seconds, team, PlayerIn=player_in, PlayerOut=player_out)
+            elif draw < substitution_rate + foul_rate:
+                event('Foul', period_name, seconds, team, Player=player, FoulType=rnd.choice(FOUL_TYPES))
+            elif draw < 0.65:
+                points = rnd.choice([1, 2, 2, 2, 3])
+                if rnd.random() < 0.5:
+                    assist = None
+                    if points > 1 and rnd.random() < 0.5:
+                        assist = rnd.choice([p for p in on_court[team] if p != player])
+                    score[team] += points
+                    event('Shot', period_name, seconds, team, Player=player, ShotResult=MADE[points], Assist=assist)
+                else:
+                    event('Shot', period_name, seconds, team, Player=player, ShotResult=MISSED[points])
+                    if rnd.random() < 0.7:
+                        rebound_team = rnd.choice([team, other, other])
+                        rebound_type = 'OffensiveRebound' if rebound_team == team else 'DefensiveRebound'
+                        event(rebound_type, period_name, seconds, rebound_team, Player=rnd.choice(on_court[rebound_team]))
+            elif draw < 0.8:
+                event('Turnover', period_name, seconds, team, Player=player)
+                if rnd.random() < 0.5:
+                    event('Steal', period_name, seconds, other, Player=rnd.choice(on_court[other]))
+            else:
+                event('Block', period_name, seconds, team, Player=player)
+        periods.append({'HomeGoals': score['H'] - score_at_start['H'], 'AwayGoals': score['B'] - score_at_start['B']})
+
+    summary = {'Tournament': 'BLNO Synthetic League', 'HomeTeam': teams['H'], 'AwayTeam': teams['B'],
+               'HomeGoals': score['H'], 'AwayGoals': score['B'], 'Date': date, 'Periods': periods}
+    data = {'Events': events, 'HomePlayers': players['H'], 'AwayPlayers': players['B']}
+    return summary, data
+
+
+def season(no_matches, seed=0, first_match_id=1):
+    """
+    Matches of all profiles, mostly regular games like in a real season
+    :return: generator of match id, profile name, summary and events view models
+    """
+    rnd = random.Random(seed)
+    for match_id in range(first_match_id, first_match_id + no_matches):
+        profile = rnd.choices(list(SEASON_MIX), list(SEASON_MIX.values()))[0]
+        summary, data = match(match_id, seed=seed, **PROFILES[profile])
+        yield match_id, profile, summary, data
+
+
+def write_match(storage, match_id, summary, data, path_staging_in='blno/STAGING_IN/'):
+    """
+    Saves a generated match the way the downloader does
+    """
+    storage.write(path_staging_in + str(match_id) + '_MatchSummaryViewModel.json', json.dumps(summary))
+    storage.write(path_staging_in + str(match_id) + '_MatchEventsViewModel.json', json.dumps(data))
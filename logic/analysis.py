@@ -1,18 +1,26 @@
 import pandas as pd
 import warnings
 from logic.dictionary import Dictionary
+from logic.instrumentation import profiled, stage
+from logic.stints import Stints
 from logic.utility import Utility
 
 
 class Analysis:
     """
-    dry_run: if True, do not write to S3
+    dry_run: if True, do not write to storage
+    storage: where the staging files are read from and the results saved to, default_storage() if None
+    utility: Utility of the match that is already built, e.g. by utility.load_batch
+    output: 'folders', 'bundle' or 'both', see Utility; not used if utility is given
+    season: SeasonAggregates updated with the player statistic of the match
     """
-    def __init__(self, match_id, dry_run=True):
+    def __init__(self, match_id, dry_run=True, storage=None, utility=None, output=None, season=None):
 
         self.__match_id = match_id
         self.__dry_run = dry_run
-        self.__utility = Utility(match_id=self.__match_id, dry_run=self.__dry_run)
+        if utility is None:
+            utility = Utility(match_id=self.__match_id, dry_run=self.__dry_run, storage=storage, output=output)
+        self.__utility = utility
         self.__dic = Dictionary()
 
         self.__events = self.__utility.get_events()
@@ -26,78 +34,70 @@ class Analysis:
         self.__shooting_stat_df = self.__utility.get_shooting_stat()
         self.__non_shooting_stat_df = self.__utility.get_non_shooting_stat()
         self.__dict_shot_result_points = self.__dic.shot_result_points
+        self.__season = season
+        self.__df_player_stat = None
+        self.__stints = None
 
     def match_header(self):
         self.__utility.match_header()
 
-    def point_accumulation(self):
-        f_made_shots = (self.__events.MatchEventType == 'Shot') & \
-                       (self.__events.ShotResult.isin([200444, 200443, 200442]))  # made shots
-        made_shots_df = self.__events.loc[f_made_shots][['MinuteRound', 'ShotResult', 'HomeAway']]
-        made_shots_df['PointScored'] = made_shots_df.ShotResult.replace(self.__dict_shot_result_points)
-        made_shots_df['MinuteRound'] = made_shots_df.MinuteRound.astype('str')
-
-        end_minute = made_shots_df['MinuteRound'].max() # not always 40 - if overtime
-        home_shots_cum_df = made_shots_df.loc[made_shots_df.HomeAway == 'Home'][['MinuteRound', 'PointScored']]
-        home_shots_cum_df['CumulativePoints'] = home_shots_cum_df.PointScored.cumsum()
-        home_shots_cum_df = home_shots_cum_df[['MinuteRound', 'CumulativePoints']] \
-            .groupby('MinuteRound') \
-            .agg('max') \
-            .reset_index()
-
-        away_shots_cum_df = made_shots_df.loc[made_shots_df.HomeAway == 'Away'][['MinuteRound', 'PointScored']]
-        away_shots_cum_df['CumulativePoints'] = away_shots_cum_df.PointScored.cumsum()
-        away_shots_cum_df = away_shots_cum_df[['MinuteRound', 'CumulativePoints']] \
-            .groupby('MinuteRound') \
-            .agg('max') \
-            .reset_index()
-
-        dict_home_shots_cum = home_shots_cum_df.to_dict()
-        dict_away_shots_cum = away_shots_cum_df.to_dict()
-
-        dict_home_cum_score = {'1900-01-01 00:00:00': 0}
-        dict_away_cum_score = {'1900-01-01 00:00:00': 0}
-        list_all_minutes = list(pd.Series(
-            pd.date_range(start='1900-01-01 00:01:00', end=end_minute, freq='min'))
-                                .dt.strftime('%M-%s'))
-        home_swapped_dict = dict((v, k) for k, v in dict_home_shots_cum['MinuteRound'].items())
-        away_swapped_dict = dict((v, k) for k, v in dict_away_shots_cum['MinuteRound'].items())
-
-        home_score = 0
-        away_score = 0
-        for minute in list_all_minutes:
-
-            try:
-                index = home_swapped_dict[minute]
-                home_score = dict_home_shots_cum['CumulativePoints'][index]
-                dict_home_cum_score[minute] = home_score
-            except:
-                dict_home_cum_score[minute] = home_score
-
-            try:
-                index = away_swapped_dict[minute]
-                away_score = dict_away_shots_cum['CumulativePoints'][index]
-                dict_away_cum_score[minute] = away_score
-            except:
-                dict_away_cum_score[minute] = away_score
-
-        home_cum_score_df = pd.DataFrame.from_dict(dict_home_cum_score, orient='index', columns=['Score']) \
-            .reset_index() \
-            .rename(columns={'index': 'Minute', 'Score': 'Home'})
-
-        away_cum_score_df = pd.DataFrame.from_dict(dict_away_cum_score, orient='index', columns=['Score']) \
-            .reset_index() \
-            .rename(columns={'index': 'Minute', 'Score': 'Away'})
-
-        cum_score_df = pd.merge(home_cum_score_df, away_cum_score_df, on="Minute")
-        cum_score_df['MinuteRound'] = cum_score_df.Minute.astype(str).str[-5:-3]
+    def cumulative_score(self, resolution='minute'):
+        """
+        Score of both teams through the game and the difference, positive if Home is leading
+        :param resolution: 'minute' - one row for every minute, the score at the end of the minute
+                           'second' - one row for every second of the game
+                           'event' - one row at tip-off and one for every made shot
+        :return: DataFrame with the time (MinuteRound, GameSecond), Home, Away, Difference and MatchId
+        """
+        events = self.__events
+        made_shots_df = events.loc[(events.MatchEventType == 'Shot') &
+                                   (events.ShotResult.isin([200444, 200443, 200442]))]  # made shots
+        points = made_shots_df.ShotResult.map(self.__dict_shot_result_points)
+        is_home = (made_shots_df.HomeAway == 'Home').to_numpy()
+        score_df = pd.DataFrame({'GameSecond': made_shots_df.GameSecond.to_numpy(dtype='int64'),
+                                 'Home': points.where(is_home, 0).cumsum().to_numpy(dtype='int64'),
+                                 'Away': points.where(~is_home, 0).cumsum().to_numpy(dtype='int64')})
+
+        if resolution == 'event':
+            tip_off = pd.DataFrame({'GameSecond': [0], 'Home': [0], 'Away': [0]})
+            cum_score_df = pd.concat([tip_off, score_df], ignore_index=True)
+        elif resolution in ('minute', 'second'):
+            game_length = self.__utility.get_game_length()  # not always 40 minutes - if overtime
+            if resolution == 'minute':
+                time_column, end = 'MinuteRound', game_length // 60
+                score_df['MinuteRound'] = (score_df.GameSecond + 59) // 60
+            else:
+                time_column, end = 'GameSecond', game_length
+            # the score at the end of every time unit, carried forward through the units without points
+            cum_score_df = score_df.groupby(time_column)[['Home', 'Away']].max() \
+                .reindex(range(end + 1)) \
+                .ffill() \
+                .fillna(0) \
+                .astype('int64') \
+                .rename_axis(time_column) \
+                .reset_index()
+        else:
+            raise ValueError("Unknown resolution {}".format(resolution))
+
+        if resolution == 'minute':
+            cum_score_df['Minute'] = cum_score_df.MinuteRound
+            cum_score_df = cum_score_df[['Minute', 'Home', 'Away', 'MinuteRound']]
+        else:
+            cum_score_df['MinuteRound'] = (cum_score_df.GameSecond + 59) // 60
         cum_score_df['Difference'] = cum_score_df.Home - cum_score_df.Away  # if positive -> Home leading
-
         cum_score_df['MatchId'] = self.__match_id
-        cum_score_df = cum_score_df.sort_values(by='Minute')
+        return cum_score_df
+
+    def point_accumulation(self, resolution='minute'):
+        """
+        Saves the cumulative score to the folder cumulative_score,
+        finer resolutions to cumulative_score_second and cumulative_score_event
+        :param resolution: 'minute', 'second' or 'event', see cumulative_score
+        """
         folder_name = "cumulative_score"
-        # return cum_score_df
-        self.__utility.save_dataframe(cum_score_df, folder_name)
+        if resolution != 'minute':
+            folder_name += "_" + resolution
+        self.__utility.save_dataframe(self.cumulative_score(resolution), folder_name)
 
     def assist(self):
         """
@@ -111,7 +111,6 @@ class Analysis:
         assist_df['Scorer'] = assist_df.Player.replace(self.__dict_id_player)
         assist_df['Point'] = assist_df.ShotResult.replace(self.__dict_shot_result_points)
         assist_df['Team'] = assist_df.HomeAway.replace(self.__dict_teams)
-        assist_df['MinuteRound'] = assist_df.MinuteRound.dt.strftime('%M-%s')
         assist_df['Starter'] = assist_df.PlayerId.replace(self.get_starters())
         assist_df['MatchId'] = self.__match_id
         assist_df = assist_df.drop(['ShotResult', 'Player'], axis=1).reset_index(drop=True)
@@ -132,7 +131,6 @@ class Analysis:
         df['Team'] = df.HomeAway.replace(self.__dict_teams)
         df['ShotDescription'] = df.ShotResult.replace(self.get_shot_description())
         df = df.drop(['Player', 'ShotResult'], axis=1).reset_index(drop=True)
-        df['MinuteRound'] = df.MinuteRound.dt.strftime('%M-%s')
         df['MatchId'] = self.__match_id
 
         #print(df.head(10))
@@ -206,42 +204,68 @@ class Analysis:
         folder_name = "player_stat"
         #print(all_stat_df)
         self.__utility.save_dataframe(all_stat_df, folder_name)
+        self.__df_player_stat = all_stat_df
+        if self.__season is not None:
+            self.__season.update(self.__match_id, self.get_league(), all_stat_df)
         #return all_stat_df
 
     def team_fouls_per_period(self):
-
-        list_team_foul_period = []
-        for period in self.__dic.period_name_list.keys():
-            for ha in self.__dict_teams.keys():
-                filter_bonus = (self.__events.MatchEventType == 'Foul') & \
-                               (self.__events.HomeAway == ha) & \
-                               (self.__events.PeriodName == period)
-                out = self.__events.loc[filter_bonus]['PeriodTime'].dropna()
-                if out.count() > 3:  # if team commited more than 3 fouls per period
-                    l_out = list(out)
-                    minute = str(l_out[3])  # get minute of 4th team foul in period
-                else:
-                    minute = '1900-01-01 00:00:00'
-                data = {'Period': period, 'HomeAway': ha, 'NoFouls': out.count(), 'Minute': minute}
-                list_team_foul_period.append(data)
-
-        team_foul_period = pd.DataFrame.from_records(list_team_foul_period) \
-            .reset_index(drop=True)
+        """
+        Team fouls of both teams in every period, overtimes included, and when the bonus started (4th team foul).
+        As in the FIBA rules, the team fouls of the overtimes continue the count of the 4th period.
+        NoFouls is the number of fouls in the period, Minute the period time of the 4th foul ('00:00' if the team
+        did not reach it in the period), BonusGameSecond the same moment in seconds since tip-off (empty if the team
+        did not reach it, the start of the overtime if the team reached it before the overtime).
+        """
+        events = self.__events
+        fouls = events.loc[events.MatchEventType == 'Foul', ['Period', 'HomeAway', 'PeriodTime', 'GameSecond']]
+        fouls = fouls.assign(HomeAway=fouls.HomeAway.astype(object), CountPeriod=fouls.Period.clip(upper=4))
+        fouls['TeamFoul'] = fouls.groupby(['CountPeriod', 'HomeAway']).cumcount() + 1
+        bonus = fouls.loc[fouls.TeamFoul == 4].set_index(['Period', 'HomeAway'])  # if team commited more than 3 fouls
+
+        last_period = max(int(events.Period.max()) if len(events) else 4, 4)
+        index = pd.MultiIndex.from_product([range(1, last_period + 1), list(self.__dict_teams.keys())],
+                                           names=['Period', 'HomeAway'])
+        team_foul_period = pd.DataFrame({'NoFouls': fouls.groupby(['Period', 'HomeAway']).size(),
+                                         'Minute': bonus.PeriodTime,
+                                         'BonusGameSecond': bonus.GameSecond}) \
+            .reindex(index) \
+            .reset_index()
+        team_foul_period['Period'] = team_foul_period.Period.astype('int64')
+        team_foul_period['NoFouls'] = team_foul_period.NoFouls.fillna(0).astype('int64')
+        team_foul_period['Minute'] = team_foul_period.Minute.fillna('00:00')
+        # a team in the bonus at the end of the 4th period or an overtime is in the bonus from the start of the next one
+        after_4th = team_foul_period.Period >= 4
+        reached = team_foul_period.BonusGameSecond.notnull() & after_4th
+        reached_before = reached.groupby(team_foul_period.HomeAway).transform(
+            lambda values: values.cummax().shift(fill_value=False)).astype(bool) & after_4th
+        overtime_start = 2400 + (team_foul_period.Period - 5) * 300
+        team_foul_period['BonusGameSecond'] = team_foul_period.BonusGameSecond.mask(reached_before, overtime_start) \
+            .astype('Int64')
         team_foul_period['MatchId'] = self.__match_id
         team_foul_period['TeamName'] = team_foul_period['HomeAway'].replace(self.__dict_teams)
-        team_foul_period['NoFouls'] = team_foul_period.NoFouls.astype('int64')
-        team_foul_period['Period'] = team_foul_period.Period.astype('int64')
 
+        columns = ['Period', 'HomeAway', 'NoFouls', 'Minute', 'MatchId', 'TeamName', 'BonusGameSecond']
         folder_name = "team_fouls_per_period"
-        self.__utility.save_dataframe(team_foul_period, folder_name)
+        self.__utility.save_dataframe(team_foul_period[columns], folder_name)
+
+    def lineups(self):
+        """
+        Plus/minus of every player and points, possessions and ratings of every lineup, from the lineup stints
+        """
+        stints = self.get_stints()
+        self.__utility.save_dataframe(stints.plus_minus(), "plus_minus")
+        self.__utility.save_dataframe(stints.lineup_ratings(), "lineup_ratings")
 
     def run_all_analyses(self):
-        self.match_header()
-        self.point_accumulation()
-        self.assist()
-        self.scoring()
-        self.player_statistic()
-        self.team_fouls_per_period()
+        analyses = [self.match_header, self.point_accumulation, self.assist, self.scoring, self.player_statistic,
+                    self.team_fouls_per_period, self.lineups]
+        with profiled(self.__match_id, 'analysis'), stage(self.__match_id, 'Analysis.run_all_analyses'):
+            for analysis in analyses:
+                with stage(self.__match_id, 'Analysis.' + analysis.__name__):
+                    analysis()
+            self.__utility.save_bundle(replace=True)  # all tables in one file, if the output is a bundle
+            self.__utility.mark_changed()
 
     ######
     ## Getters
@@ -250,6 +274,23 @@ class Analysis:
     def get_events(self):
         return self.__events
 
+    def get_stints(self):
+        """
+        Lineup stints are calculated on first use
+        """
+        if self.__stints is None:
+            self.__stints = Stints(self.__utility)
+        return self.__stints
+
+    def get_league(self):
+        return self.__utility.get_match_summary()['League'].iloc[0]
+
+    def get_player_stat(self):
+        """
+        :return: player statistic made by the last call of player_statistic, None before
+        """
+        return self.__df_player_stat
+
     def get_shot_description(self):
         return self.__dic.shot_description
 
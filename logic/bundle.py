@@ -0,0 +1,97 @@
+"""
+All result tables of a match in one file, blno/match_bundle/<match id>.json:
+
+    {"Version": 2, "MatchId": 7032979, "CreatedTime": "...", "Tables": {"player_stat": "{...}\n{...}", ...}}
+
+Every table is kept as the json lines text of the file in the folder of the same name, so a match is
+written with one request and read with one request instead of one per table, and the rows are parsed once
+by read_json like the files. Bundles of version 1 have the tables as lists of rows, they are still read.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import StringIO
+import json
+import os
+import pandas as pd
+from logic.compression import decompress
+from logic.storage import default_storage
+
+BUNDLE_VERSION = 2
+BUNDLE_FOLDER = 'blno/match_bundle/'
+
+
+def default_output():
+    """
+    Where the results are saved, set with the environment variable HUBIE_OUTPUT:
+    'folders' (default) - one file per table and match, 'bundle' - one bundle per match, 'both'
+    """
+    output = os.environ.get('HUBIE_OUTPUT', 'folders')
+    if output not in ('folders', 'bundle', 'both'):
+        raise ValueError("Unknown HUBIE_OUTPUT {}".format(output))
+    return output
+
+
+def bundle_key(match_id):
+    return BUNDLE_FOLDER + str(match_id) + '.json'
+
+
+def table_lines(df):
+    """
+    :return: the rows of a dataframe as json lines text, the way they are saved to the folders
+    """
+    return df.to_json(force_ascii=False, date_format='iso', orient='records', lines=True)
+
+
+def bundle_body(match_id, tables):
+    """
+    :param tables: dictionary with table (folder) name and json lines text from table_lines
+    :return: the bundle as json text
+    """
+    return json.dumps({'Version': BUNDLE_VERSION, 'MatchId': int(match_id),
+                       'CreatedTime': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'Tables': tables},
+                      ensure_ascii=False)
+
+
+def read_bundle(body):
+    """
+    :param body: content of a bundle file, compressed or not
+    :return: dictionary with table name and json lines text
+    """
+    data = json.loads(decompress(body).decode('utf-8'))
+    if data['Version'] > BUNDLE_VERSION:
+        raise ValueError("Bundle of match {} has version {}, only {} is known".format(
+            data['MatchId'], data['Version'], BUNDLE_VERSION))
+    if data['Version'] == 1:
+        return {name: '\n'.join(json.dumps(row, ensure_ascii=False) for row in rows)
+                for name, rows in data['Tables'].items()}
+    return data['Tables']
+
+
+def parse_bundle(body):
+    """
+    :param body: content of a bundle file, compressed or not
+    :return: dictionary with table name and dataframe
+    """
+    # read like the json lines files, so the columns get the same types
+    return {name: pd.read_json(StringIO(lines), lines=True) if lines.strip() else pd.DataFrame()
+            for name, lines in read_bundle(body).items()}
+
+
+def load_bundles(tables, storage=None, workers=16, keys=None):
+    """
+    Loads tables from the bundles of all matches, every bundle is read once for all tables
+    :param tables: list of table names, e.g. ['match_header', 'player_stat']
+    :param keys: keys of the bundles to read, all bundles if None
+    :return: dictionary with table name and the dataframe of all matches
+    """
+    if storage is None:
+        storage = default_storage()
+    if keys is None:
+        keys = [key for key in storage.list(BUNDLE_FOLDER) if key.endswith('.json')]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        bundles = list(executor.map(lambda key: parse_bundle(storage.read(key)), keys))
+    dict_df = {}
+    for name in tables:
+        frames = [bundle[name] for bundle in bundles if name in bundle]
+        dict_df[name] = pd.concat(frames) if frames else pd.DataFrame()
+    return dict_df
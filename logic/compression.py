@@ -0,0 +1,53 @@
+import gzip
+import os
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, gzip is always available
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def default_compression():
+    """
+    Compression used on write, set with the environment variable HUBIE_COMPRESSION: 'gzip' (default), 'zstd' or 'none'
+    """
+    return os.environ.get('HUBIE_COMPRESSION', 'gzip')
+
+
+def compress(body, method=None):
+    """
+    :param body: bytes or str, str is encoded as utf-8
+    :param method: 'gzip', 'zstd' or 'none', default_compression() if None
+    :return: compressed bytes and the content encoding to store with them (None if not compressed)
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    if method is None:
+        method = default_compression()
+    if method == 'gzip':
+        return gzip.compress(body, compresslevel=6, mtime=0), 'gzip'
+    if method == 'zstd':
+        if zstandard is None:
+            raise ImportError("HUBIE_COMPRESSION=zstd needs the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress(body), 'zstd'
+    if method == 'none':
+        return body, None
+    raise ValueError("Unknown compression {}".format(method))
+
+
+def decompress(body):
+    """
+    Recognizes gzip and zstd by their magic bytes, anything else is returned as it is,
+    so files saved before compression was turned on are still read
+    :return: uncompressed bytes
+    """
+    if body[:2] == GZIP_MAGIC:
+        return gzip.decompress(body)
+    if body[:4] == ZSTD_MAGIC:
+        if zstandard is None:
+            raise ImportError("reading zstd compressed files needs the zstandard package")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    return body
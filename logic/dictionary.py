@@ -24,4 +24,23 @@ class Dictionary():
                           200581: 0,
                           200443: 2,
                           200580: 0,
-                          200442: 3}
\ No newline at end of file
+                          200442: 3}
+
+    # column of the shooting statistic each shot result is counted in
+    shot_stat_column = {200443: "Made2",
+                        200581: "Missed2",
+                        200444: "Made1",
+                        200445: "Missed1",
+                        200442: "Made3",
+                        200580: "Missed3"}
+
+    non_shooting_event_types = ['DefensiveRebound', 'OffensiveRebound', 'Turnover', 'Steal', 'Block']
+
+    # mojibake and html entities found in the scraped pages and the norwegian letters they stand for
+    nor_char_replacement = {"&#248;": "ø",
+                            "&#229;": "å",
+                            "Ã¸": "ø",
+                            "Ã˜": "Ø",
+                            "Ã¥": "å",
+                            "Ã¦": "æ",
+                            "Ã©": "é"}
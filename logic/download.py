@@ -1,62 +1,264 @@
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urlparse
 import json
 import re
+import threading
+import time
 import requests
-from functools import reduce
-import boto3
+from requests.adapters import HTTPAdapter
+from logic.compression import compress
+from logic.manifest import Manifest
+from logic.nor_char import repair_nor_chars
+from logic.storage import default_storage
+
+MATCH_DETAILS_URL = "https://wp.nif.no/MatchDetails?id="
+VIEW_MODELS = ['MatchSummaryViewModel', 'MatchEventsViewModel']
+
+
+# both view models are found with one scan of the page, no DOM is built
+_view_model_start = re.compile(rb'Nif\.Basket\.(' + b'|'.join(v.encode() for v in VIEW_MODELS) + rb')\(\{')
+
+
+def extract_view_models(html):
+    """
+    Scans the MatchDetails page once for the Nif.Basket.*ViewModel({...}); script calls
+    and stops as soon as all view models are found
+    :param html: content of the MatchDetails page, bytes or str
+    :return: dictionary with view model name as key and the json payload (bytes) as value
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8')
+    view_models = {}
+    pos = 0
+    while len(view_models) < len(VIEW_MODELS):
+        match = _view_model_start.search(html, pos)
+        if match is None:
+            break
+        start = match.end() - 1  # keep the opening {
+        end = html.find(b'});', start)
+        if end == -1:
+            break
+        view_models.setdefault(match.group(1).decode(), html[start:end + 1])
+        pos = end + 3
+    return view_models
+
+
+def parse_view_models(html):
+    """
+    Finds the view models embedded in the MatchDetails page
+    :param html: content of the MatchDetails page
+    :return: dictionary with view model name as key and json text with norwegian chars as value
+    """
+    view_models = {}
+    for search, payload in extract_view_models(html).items():
+        # replace the chars with norwegian chars before the json is parsed
+        data_json = json.loads(repair_nor_chars(payload))
+        view_models[search] = json.dumps(data_json)
+    return view_models
 
 
 class Download:
-    def __init__(self, list_match_id):
+    """
+    force: if True, download also the matches the manifest marks as finished
+    storage: where the files are saved, default_storage() if None
+    """
+    def __init__(self, list_match_id, force=False, storage=None):
         self.__list_match_id = list_match_id
+        self.__force = force
         self.__path_staging_in = "blno/STAGING_IN/"
-        self.__s3_resource = boto3.resource('s3')
-        self.__bucket_name = 'hubie'
-        
+        self.__storage = storage if storage is not None else default_storage()
+        self.__manifest = Manifest(storage=self.__storage)
+        self.__list_changed_match_id = []
+
         for match_id in self.__list_match_id:
+            if not self.__force and self.__manifest.is_finished(match_id):
+                print("Match Id {} is finished, skipped".format(match_id))
+                continue
             self.__parse_html_to_json(match_id=match_id)
-        
-    def __convert_to_nor_char(self, d):
-        """
-        Converts special characters to norwegian letters
-        """
-        rep = {"&#248;": "ø",
-               "\u00f8": "ø",
-               "&#229;": "å",
-               "Ã¸": 'ø',
-               "Ã˜": "Ø",
-               "Ã¥": "å",
-               "Ã¦": "æ",
-               "Ã©": "é"}
-        replaced_dict = reduce(lambda a, kv: a.replace(*kv), rep.items(), str(d))
-
-        return eval(replaced_dict)
-    
-    
+        self.__manifest.save()
+
     def __parse_html_to_json(self, match_id):
         match_id = str(match_id)
 
-        url = "https://wp.nif.no/MatchDetails?id=" + str(match_id)
+        url = MATCH_DETAILS_URL + str(match_id)
         response = requests.get(url, allow_redirects=True) # download the website
-        response.encoding = response.apparent_encoding
         if response.ok:
-            html = response.content
-            soup = BeautifulSoup(html, 'html.parser')
-            search_dict = ['MatchSummaryViewModel', 'MatchEventsViewModel']
-            for search in search_dict:
-                JSON = re.compile('Nif.Basket.' + search + '(\({.*?}\));', re.DOTALL)
-                matches = JSON.search(soup.get_text())
-                if matches != None:
-                    data_json = json.loads(matches.group(1)[1:-1]) #takes away the ()
-                    nor_char_data_json = json.dumps(self.__convert_to_nor_char(data_json)) # replace the chars with norwegian chars
-
+            view_models = parse_view_models(response.content)
+            changed = self.__manifest.changed_view_models(match_id, view_models)
+            for search in VIEW_MODELS:
+                if search not in view_models:
+                    print("Match Id {} does not exist".format(match_id))
+                elif search not in changed:
+                    print("Match Id {} {} unchanged, not saved".format(match_id, search))
+                else:
                     file_name = match_id + "_" + search + '.json'
+                    body, content_encoding = compress(view_models[search])
+                    self.__storage.write(self.__path_staging_in + file_name, body, content_encoding)
+                    print("File {} saved to {}".format(file_name, self.__path_staging_in))
+            self.__manifest.commit(match_id, view_models, changed)
+            if changed:
+                self.__list_changed_match_id.append(int(match_id))
 
-                    s3object = self.__s3_resource.Object(self.__bucket_name, self.__path_staging_in + file_name)
+    def get_changed_match_ids(self):
+        """
+        :return: ids of the matches with new or changed view models, the ones that need to be analysed
+        """
+        return self.__list_changed_match_id
 
-                    s3object.put(
-                        Body=(nor_char_data_json)
-                    )
-                    print("File {} saved to {}".format(file_name, self.__path_staging_in))
-                else:
-                    print("Match Id {} does not exist".format(match_id))
\ No newline at end of file
+
+class RateLimiter:
+    """
+    Spaces out requests to the same host so that no host gets more than requests_per_second calls.
+    Safe to share between threads.
+    """
+    def __init__(self, requests_per_second=5.0):
+        self.__interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self.__next_slot = {}
+        self.__lock = threading.Lock()
+
+    def wait(self, url):
+        if self.__interval == 0.0:
+            return
+        host = urlparse(url).netloc
+        with self.__lock:
+            now = time.monotonic()
+            slot = max(now, self.__next_slot.get(host, now))
+            self.__next_slot[host] = slot + self.__interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BulkDownload:
+    """
+    Downloads many matches concurrently: a bounded thread pool shares one keep-alive HTTP session and one storage client,
+    requests are rate limited per host and failed requests are retried with exponential backoff.
+
+    workers: number of matches downloaded at the same time
+    requests_per_second: maximum number of requests per host, 0 turns off the rate limiting
+    retries: number of extra attempts after a failed request
+    backoff: seconds to wait before the first retry, doubled for every following retry
+    base_url: url the match id is appended to, can point to a local server for testing
+    force: if True, download also the matches the manifest marks as finished
+    storage: where the files are saved, default_storage() if None
+    dry_run: if True, do not write to storage and do not use the manifest
+    """
+    def __init__(self, list_match_id, workers=8, requests_per_second=5.0, retries=3, backoff=0.5,
+                 base_url=MATCH_DETAILS_URL, timeout=30, force=False, storage=None, dry_run=False):
+        self.__list_match_id = list_match_id
+        self.__workers = workers
+        self.__retries = retries
+        self.__backoff = backoff
+        self.__base_url = base_url
+        self.__timeout = timeout
+        self.__force = force
+        self.__dry_run = dry_run
+        self.__path_staging_in = "blno/STAGING_IN/"
+        self.__rate_limiter = RateLimiter(requests_per_second)
+
+        self.__session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.__session.mount('http://', adapter)
+        self.__session.mount('https://', adapter)
+        self.__storage = storage if storage is not None else default_storage()
+        self.__manifest = None
+        if not self.__dry_run:
+            self.__manifest = Manifest(storage=self.__storage)
+
+        self.__results = []
+        self.__elapsed = 0.0
+
+    def run(self):
+        """
+        Downloads all matches and saves the view models to STAGING_IN
+        :return: list with one dictionary per match: MatchId, Status ('ok', 'unchanged', 'skipped', 'missing' or 'failed'),
+                 Seconds, Error
+        """
+        start = time.perf_counter()
+        self.__results = []
+        with ThreadPoolExecutor(max_workers=self.__workers) as executor:
+            futures = [executor.submit(self.__download_match, match_id) for match_id in self.__list_match_id]
+            for future in as_completed(futures):
+                result = future.result()
+                self.__results.append(result)
+                if result['Status'] == 'failed':
+                    print("Match Id {} failed: {}".format(result['MatchId'], result['Error']))
+        self.__elapsed = time.perf_counter() - start
+        self.__session.close()
+        if self.__manifest is not None:
+            self.__manifest.save()
+        print("Downloaded {} matches in {:.1f}s ({:.2f} matches/s), {} failed".format(
+            len(self.__results), self.__elapsed, self.throughput(), len(self.get_failed())))
+        return self.__results
+
+    def __download_match(self, match_id):
+        start = time.perf_counter()
+        result = {'MatchId': match_id, 'Status': 'ok', 'Seconds': 0.0, 'Error': None}
+        try:
+            if self.__manifest is not None and not self.__force and self.__manifest.is_finished(match_id):
+                result['Status'] = 'skipped'
+                return result
+            html = self.__fetch(self.__base_url + str(match_id))
+            view_models = parse_view_models(html)
+            changed = list(view_models)
+            if self.__manifest is not None:
+                changed = self.__manifest.changed_view_models(match_id, view_models)
+            if not view_models:
+                result['Status'] = 'missing'
+            elif not changed:
+                result['Status'] = 'unchanged'
+            for search in changed:
+                self.__save(str(match_id) + "_" + search + '.json', view_models[search])
+            if self.__manifest is not None:  # only once the files are saved, a failed save is tried again
+                self.__manifest.commit(match_id, view_models, changed)
+        except Exception as e:
+            result['Status'] = 'failed'
+            result['Error'] = repr(e)
+        result['Seconds'] = time.perf_counter() - start
+        return result
+
+    def __fetch(self, url):
+        attempt = 0
+        while True:
+            self.__rate_limiter.wait(url)
+            try:
+                response = self.__session.get(url, allow_redirects=True, timeout=self.__timeout)
+                if response.status_code != 429 and response.status_code < 500:
+                    response.raise_for_status()
+                    return response.content
+                error = requests.HTTPError("{} for url {}".format(response.status_code, url), response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt >= self.__retries:
+                raise error
+            time.sleep(self.__backoff * 2 ** attempt)
+            attempt += 1
+
+    def __save(self, file_name, body):
+        if self.__dry_run:
+            return
+        body, content_encoding = compress(body)
+        self.__storage.write(self.__path_staging_in + file_name, body, content_encoding)
+
+    ######
+    ## Getters
+    ######
+
+    def get_results(self):
+        return self.__results
+
+    def get_failed(self):
+        return [result for result in self.__results if result['Status'] == 'failed']
+
+    def get_changed_match_ids(self):
+        """
+        :return: ids of the matches with new or changed view models, the ones that need to be analysed
+        """
+        return [result['MatchId'] for result in self.__results if result['Status'] == 'ok']
+
+    def throughput(self):
+        """
+        :return: matches per second of the last run
+        """
+        if self.__elapsed == 0.0:
+            return 0.0
+        return len(self.__results) / self.__elapsed
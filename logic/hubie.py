@@ -10,7 +10,9 @@ import warnings
 
 #warnings.simplefilter(action='ignore', category=FutureWarning)
 
-logic = Logic(verbose=False)
+# the datasets are loaded in the background, so the workers start and answer health checks right away;
+# new and analysed again matches are picked up every 30 seconds
+logic = Logic(verbose=False, lazy=True, refresh_seconds=30)
 
 # Text for explaining Box Score tab
 box_score_star_text = "* - player is starter."
@@ -69,14 +71,31 @@ def style_data_conditional_box_score(max_eff):
     return list_style_data_conditional_box_score
 
 
-leagues = logic.all_leagues()  # ['BLNO Kvinner Grunnserie']#, 'BLNO Menn Grunnserie']
-
 #######
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
 server = app.server
 app.title = 'Hubie'
-app.layout = html.Div([html.Div([dcc.Store(id='memory-title'),
+
+
+@server.route('/health')
+def health():
+    return 'ok'
+
+
+@server.route('/ready')
+def ready():
+    """
+    503 until all datasets are loaded, the leagues and matches are shown before that
+    """
+    if logic.is_ready():
+        return 'ready'
+    return 'loading', 503
+
+
+# leagues and matches are filled in by the callbacks, the layout does not wait for the datasets
+app.layout = html.Div([dcc.Location(id='url'),
+                       html.Div([dcc.Store(id='memory-title'),
                                  dcc.Store(id='memory-quarter-score'),
                                  dcc.Store(id='memory-cumulative-score-data'),
                                  dcc.Store(id='memory-difference-data'),
@@ -92,16 +111,11 @@ app.layout = html.Div([html.Div([dcc.Store(id='memory-title'),
                                  # left split
                                  html.Div([
                                      html.H4(children='Pick a league:'),
-                                     dcc.RadioItems(
-                                         id='league-dropdown',
-                                         options=[{'label': k, 'value': k} for k in leagues],
-                                         value=leagues[0]
-                                     ),
+                                     dcc.RadioItems(id='league-dropdown'),
                                      html.Br(),
                                      html.H6(children='Pick a match:'),
                                      dcc.RadioItems(id='match-dropdown'),
                                      dcc.Dropdown(id='dropdown-match',
-                                                  options=logic.match_list(leagues[0]),
                                                   style={'width': '70%',
                                                          'display': 'inline-block'}
                                                   )
@@ -206,10 +220,23 @@ app.layout = html.Div([html.Div([dcc.Store(id='memory-title'),
 
 #####################
 # left menu
+@app.callback(
+    [Output('league-dropdown', 'options'),
+     Output('league-dropdown', 'value')],
+    [Input('url', 'pathname')])
+def set_league_options(pathname):
+    leagues = logic.all_leagues()  # ['BLNO Kvinner Grunnserie']#, 'BLNO Menn Grunnserie']
+    if not leagues:
+        raise PreventUpdate
+    return [{'label': k, 'value': k} for k in leagues], leagues[0]
+
+
 @app.callback(
     Output('dropdown-match', 'options'),
     [Input('league-dropdown', 'value')])
 def set_match_options(selected_league):
+    if selected_league is None:
+        raise PreventUpdate
     logic.write_details("League: " + selected_league)
     return logic.match_list(selected_league)
 
@@ -218,6 +245,8 @@ def set_match_options(selected_league):
     Output('dropdown-match', 'value'),
     [Input('dropdown-match', 'options')])
 def set_match_value(leagues):
+    if not leagues:
+        raise PreventUpdate
     return leagues[0]['value']
 
 
@@ -231,6 +260,8 @@ def set_match_value(leagues):
                Output('tab-box-score-title-away', 'label')],
               [Input('dropdown-match', 'value')])
 def memory_title(match_id):
+    if match_id is None:
+        raise PreventUpdate
     print(match_id)
     title = logic.match_title(match_id)
     title_home = logic.get_home_team()
@@ -259,6 +290,8 @@ def set_h1_title(title_data, quarter_score_data):
                Output('memory-score-per-quarter-data', 'data')],
               [Input('dropdown-match', 'value')])
 def memory_scoring(match_id):
+    if match_id is None:
+        raise PreventUpdate
     _return_cumulative_score, _return_difference = logic.cumulative_score(match_id)
     _return_score_starter_bench = logic.starter_bench(match_id, 'Points')
     quarter_score, _return_score_per_quarter = logic.quarter_score(match_id)
@@ -290,6 +323,8 @@ def tab_scoring(data_cum_score, data_difference, data_score_starter_bench, data_
                Output('memory-box-score-away-data', 'data')],
               [Input('dropdown-match', 'value')])
 def memory_box_score(match_id):
+    if match_id is None:
+        raise PreventUpdate
     logic.write_details("MatchId: " + str(match_id))
     return_cols = logic.get_box_score_cols()
     return_data_home, return_data_away = logic.box_score(match_id)
@@ -325,6 +360,8 @@ def set_box_score(data_cols, data_home, data_away):
                Output('memory-efficiency-away-data', 'data')],
               [Input('dropdown-match', 'value')])
 def memory_efficiency(match_id):
+    if match_id is None:
+        raise PreventUpdate
     _return = logic.data_efficiency(match_id)
     efficiency_home = _return[0]
     efficiency_away = _return[1]
@@ -351,6 +388,8 @@ def set_efficiency(data_home, data_away):
                Output('memory-assists-starter-bench-data', 'data')],
               [Input('dropdown-match', 'value')])
 def memory_assist(str_match_id):
+    if str_match_id is None:
+        raise PreventUpdate
     assist = logic.assist(int(str_match_id))
     assist_starter_bench = logic.starter_bench(int(str_match_id), 'AST')
     logic.write_details("assist_starter_bench -> " + str(assist_starter_bench))
@@ -0,0 +1,128 @@
+"""
+Timing of the pipeline stages. Every stage records wall time, CPU time, rows and bytes read and written per match.
+Stages can be nested, e.g. the save of a dataframe inside the analysis that made it: bytes count for all
+stages they happen in, rows for the innermost one.
+
+Configured with environment variables:
+HUBIE_METRICS: '1' prints every finished stage as a json line starting with 'metrics ',
+               any other value is a file the json lines are appended to
+HUBIE_PROFILE_MATCH: match id whose Utility and analyses are run under cProfile,
+                     the stats are saved to HUBIE_PROFILE_DIR (default '.')
+"""
+from collections import deque
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+
+_records = deque(maxlen=10000)  # the last stages, older ones are dropped so a long running process does not grow
+_records_lock = threading.Lock()
+_local = threading.local()
+
+
+def _active():
+    if not hasattr(_local, 'stack'):
+        _local.stack = []
+    return _local.stack
+
+
+def _emit(record):
+    target = os.environ.get('HUBIE_METRICS')
+    if not target:
+        return
+    line = json.dumps(record)
+    if target == '1':
+        print("metrics " + line)
+    else:
+        with _records_lock, open(target, 'a') as f:
+            f.write(line + '\n')
+
+
+@contextmanager
+def stage(match_id, name):
+    """
+    Times the code in the with block:
+
+        with stage(match_id, 'Analysis.scoring'):
+            ...
+
+    :return: the record of the stage, rows and bytes can be set on it directly
+    """
+    record = {'MatchId': match_id, 'Stage': name, 'WallSeconds': 0.0, 'CpuSeconds': 0.0,
+              'Rows': None, 'BytesRead': 0, 'BytesWritten': 0}
+    active = _active()
+    active.append(record)
+    wall = time.perf_counter()
+    cpu = time.process_time()  # CPU time of the whole process, also of other threads running at the same time
+    try:
+        yield record
+    finally:
+        record['WallSeconds'] = time.perf_counter() - wall
+        record['CpuSeconds'] = time.process_time() - cpu
+        active.pop()
+        with _records_lock:
+            _records.append(record)
+        _emit(record)
+
+
+def add_rows(rows):
+    """
+    Sets the rows of the innermost running stage
+    """
+    active = _active()
+    if active:
+        active[-1]['Rows'] = rows
+
+
+def add_bytes_read(no_bytes):
+    for record in _active():
+        record['BytesRead'] += no_bytes
+
+
+def add_bytes_written(no_bytes):
+    for record in _active():
+        record['BytesWritten'] += no_bytes
+
+
+def get_records(match_id=None):
+    """
+    :return: finished stages, of one match if match_id is given, in the order they finished
+    """
+    with _records_lock:
+        return [record for record in _records if match_id is None or record['MatchId'] == match_id]
+
+
+def pop_records(match_id):
+    """
+    :return: finished stages of one match, they are removed from the records
+    """
+    with _records_lock:
+        records = [record for record in _records if record['MatchId'] == match_id]
+        remaining = [record for record in _records if record['MatchId'] != match_id]
+        _records.clear()
+        _records.extend(remaining)
+    return records
+
+
+@contextmanager
+def profiled(match_id, part):
+    """
+    Runs the with block under cProfile if match_id is the one in HUBIE_PROFILE_MATCH, otherwise does nothing.
+    The stats are saved to HUBIE_PROFILE_DIR/profile_<match id>_<part>.prof and the 20 slowest calls are printed.
+    """
+    if str(match_id) != os.environ.get('HUBIE_PROFILE_MATCH'):
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        path = os.path.join(os.environ.get('HUBIE_PROFILE_DIR', '.'), 'profile_{}_{}.prof'.format(match_id, part))
+        profile.dump_stats(path)
+        print("Profile of match {} saved to {}".format(match_id, path))
+        pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
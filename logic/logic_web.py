@@ -1,40 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import numpy as np
 import plotly.graph_objs as go
-import boto3
 import pandas as pd
+from logic.bundle import BUNDLE_FOLDER, default_output, load_bundles
+from logic.snapshot import changes_version, key_match_id, load_folder, read_json_files
+from logic.storage import default_storage
 
 pd.set_option('display.max_rows', 500)
 pd.set_option('display.max_columns', 500)
 
+# tables of the web app, match_header first: it has the leagues and matches the first page shows
+TABLES = ["match_header", "player_stat", "cumulative_score", "assists"]
+# tables the pages also read as a whole, the others are only read match by match and keep no whole frame
+WHOLE_TABLES = ["match_header"]
 
-def load_dataframe(folder):
+
+def index_by_match(df):
     """
-    Load data from all files in a folder to a dataframe
-    :param folder: holds files with datasets
-    :return: dataframe
+    Splits a dataframe into the rows of every match. The frame is sorted by MatchId once and cut where
+    the MatchId changes, so the rows of a match are found without scanning the whole frame.
+    :return: dictionary with match id and the rows of the match, in the order they were loaded
     """
-    s3 = boto3.resource('s3')
-    bucket_name = "hubie"
-    bucket = s3.Bucket(bucket_name)
-    path = "blno/" + folder
-    df = pd.DataFrame()
-    for obj in bucket.objects.filter(Prefix=path):
-        file_name = obj.key
-        if file_name.find('json') != -1:
-            obj = s3.Object(bucket_name, file_name)
-            body = obj.get()['Body'].read()
-            df_tmp = pd.read_json(body, lines=True)
-            df = df.append(df_tmp)
-    return df
+    if df.empty or 'MatchId' not in df:
+        return {}
+    df = df.sort_values('MatchId', kind='stable')
+    match_ids = df.MatchId.to_numpy()
+    starts = np.flatnonzero(np.r_[True, match_ids[1:] != match_ids[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+    return {int(match_ids[start]): df.iloc[start:end] for start, end in zip(starts, ends)}
 
 
 class Logic:
     """
     """
 
-    def __init__(self, str_match_id=7032979, verbose=True):
+    def __init__(self, str_match_id=7032979, verbose=True, storage=None, source=None, lazy=False,
+                 refresh_seconds=None):
         """
         Initialize the instance of Logic object
         :param str_match_id: id of the match that is being visualized
+        :param storage: where the datasets are read from, default_storage() if None
+        :param source: 'folders' or 'bundle' (one file per match with all tables),
+                       'bundle' if None and HUBIE_OUTPUT is 'bundle', otherwise 'folders'
+        :param lazy: if True, return at once and load the datasets in a background thread, match_header first;
+                     a dataset needed before it is loaded is loaded by the caller. See is_ready and wait_ready.
+        :param refresh_seconds: if set, storage is polled this often for new and changed matches, see refresh
         """
         self.__match_id = int(str_match_id)
         self.__verbose = verbose # print out data for debugging
@@ -47,10 +58,193 @@ class Logic:
         self.__cols_box_score = self.__cols_box_score + ['DREB', 'OREB', 'REB', 'AST', 'STL', 'TOV', 'BLK', 'FLS',
                                                          'Efficiency']
 
-        self.__df_match_list = load_dataframe("match_header")
-        self.__df_player_stat = load_dataframe("player_stat")
-        self.__df_cumulative_score = load_dataframe("cumulative_score")
-        self.__df_assist = load_dataframe("assists")
+        if source is None:
+            source = 'bundle' if default_output() == 'bundle' else 'folders'
+        self.__source = source
+        self.__storage = storage if storage is not None else default_storage()
+        # table name and its Frame (WHOLE_TABLES only, None for the others), Index (rows of every match), Empty frame
+        # and the Versions of the files it was loaded from.
+        # The state is replaced as a whole and never changed in place, so readers see a complete state
+        self.__state = {}
+        self.__state_lock = threading.Lock()
+        if source == 'bundle':  # a bundle has all tables, they are loaded together
+            lock = threading.Lock()
+            self.__dict_lock = {table: lock for table in TABLES}
+        else:
+            self.__dict_lock = {table: threading.Lock() for table in TABLES}
+        self.__refresh_lock = threading.Lock()
+        self.__changes = None  # version of the change marker at the last refresh that listed all tables
+        self.__stop = threading.Event()
+        self.__ready = threading.Event()
+
+        if lazy:
+            threading.Thread(target=self.__warm_in_background, name='logic-warm', daemon=True).start()
+        else:
+            self.__warm()
+        if refresh_seconds:
+            threading.Thread(target=self.__refresh_in_background, args=(refresh_seconds,), name='logic-refresh',
+                             daemon=True).start()
+
+    def __warm(self):
+        """
+        Loads match_header, then the other tables at the same time
+        """
+        self.__table(TABLES[0])
+        with ThreadPoolExecutor(max_workers=len(TABLES) - 1) as executor:
+            list(executor.map(self.__table, TABLES[1:]))
+
+    def __warm_in_background(self):
+        try:
+            self.__warm()
+        except Exception as e:  # the tables not loaded are tried again when they are needed
+            print("Loading the datasets failed: {}".format(e))
+            return
+        self.write_details("All datasets loaded")
+
+    def __table(self, table):
+        """
+        :param table: name of the folder, e.g. 'player_stat'
+        :return: state of the table, loaded on first access
+        """
+        entry = self.__state.get(table)
+        if entry is None:
+            with self.__dict_lock[table]:
+                if table not in self.__state:
+                    self.__load(table)
+            entry = self.__state[table]
+        return entry
+
+    def __versions(self, table):
+        """
+        :return: dictionary with key and version of the per-match files the table is loaded from
+        """
+        prefix = BUNDLE_FOLDER if self.__source == 'bundle' else "blno/" + table + "/"
+        return {key: version for key, version in self.__storage.list_versions(prefix).items()
+                if key_match_id(key) is not None}
+
+    def __load(self, table):
+        versions = self.__versions(table)  # before the files are read, a file written meanwhile is read again
+        if self.__source == 'bundle':
+            dict_df = load_bundles(TABLES, self.__storage, keys=sorted(versions))
+        else:
+            dict_df = {table: load_folder(table, self.__storage, versions=versions)}
+        self.__swap({name: self.__entry(name, df, index_by_match(df), versions) for name, df in dict_df.items()})
+
+    @staticmethod
+    def __entry(table, df, index, versions):
+        """
+        The rows of the matches in index are slices of a sorted copy of df, df itself is only kept for WHOLE_TABLES.
+        Empty is a copy, a slice would keep all of df alive
+        """
+        frame = df if table in WHOLE_TABLES else None
+        return {'Frame': frame, 'Index': index, 'Empty': df.iloc[:0].copy(), 'Versions': versions}
+
+    def __swap(self, entries):
+        """
+        Replaces the state with one that has the given tables
+        """
+        with self.__state_lock:
+            state = dict(self.__state)
+            state.update(entries)
+            self.__state = state
+        if all(table in state for table in TABLES):
+            self.__ready.set()
+
+    def refresh(self):
+        """
+        Reads the per-match files that were written or removed since the tables were loaded and swaps the
+        changed tables in at once, the rest of the tables is not read again.
+        The folders are only listed when the change marker the analyses write has changed since the last refresh,
+        otherwise a refresh is one request. Without a marker they are listed every time
+        :return: number of matches that changed
+        """
+        with self.__refresh_lock:
+            changes = changes_version(self.__storage)  # before the listing, a change meanwhile is listed again
+            if changes is not None and changes == self.__changes:
+                return 0
+            state = self.__state
+            if self.__source == 'bundle':
+                units = [TABLES] if TABLES[0] in state else []
+            else:
+                units = [[table] for table in TABLES if table in state]  # tables not loaded yet are loaded new
+
+            entries = {}
+            match_ids = set()
+            for tables in units:
+                old_versions = state[tables[0]]['Versions']
+                versions = self.__versions(tables[0])
+                changed = [key for key, version in versions.items() if old_versions.get(key) != version]
+                removed = [key for key in old_versions if key not in versions]
+                if not changed and not removed:
+                    continue
+                changed_ids = {key_match_id(key) for key in changed + removed}
+                match_ids |= changed_ids
+                if self.__source == 'bundle':
+                    dict_df = load_bundles(tables, self.__storage, keys=changed)
+                else:
+                    dict_df = {tables[0]: read_json_files(changed, self.__storage)}
+                for table in tables:
+                    entries[table] = self.__merge(state[table], dict_df[table], changed_ids, versions)
+
+            if entries:
+                self.__swap(entries)
+                self.write_details("Refreshed {} matches".format(len(match_ids)))
+            if all(table in state for table in TABLES):  # a table loading now may have been listed before the change
+                self.__changes = changes
+            return len(match_ids)
+
+    @staticmethod
+    def __merge(entry, df_changed, match_ids, versions):
+        """
+        Only the index entries of the changed matches are replaced, the rows of the other matches are not touched.
+        The whole frame of WHOLE_TABLES, one row per match, is built again
+        :return: state of a table with the rows of the changed matches replaced by df_changed
+        """
+        index = dict(entry['Index'])
+        for match_id in match_ids:
+            index.pop(match_id, None)
+        index.update(index_by_match(df_changed))
+        empty = entry['Empty']
+        if empty.columns.empty and not df_changed.empty:  # the table had no rows when it was loaded
+            empty = df_changed.iloc[:0].copy()
+        df = entry['Frame']
+        if df is not None:
+            if 'MatchId' in df:
+                df = df.loc[~df.MatchId.isin(match_ids)]
+            frames = [frame for frame in [df, df_changed] if not frame.empty]
+            df = pd.concat(frames, ignore_index=True) if frames else df
+        return {'Frame': df, 'Index': index, 'Empty': empty, 'Versions': versions}
+
+    def __refresh_in_background(self, seconds):
+        while not self.__stop.wait(seconds):
+            try:
+                self.refresh()
+            except Exception as e:  # tried again at the next poll
+                print("Refreshing the datasets failed: {}".format(e))
+
+    def stop_refresh(self):
+        self.__stop.set()
+
+    def __match_rows(self, table, match_id):
+        """
+        :param table: name of the folder, e.g. 'player_stat'
+        :return: rows of one match, an empty dataframe if the match is not loaded
+        """
+        entry = self.__table(table)
+        return entry['Index'].get(int(match_id), entry['Empty'])
+
+    def is_ready(self):
+        """
+        :return: True when all datasets are loaded
+        """
+        return self.__ready.is_set()
+
+    def wait_ready(self, timeout=None):
+        """
+        Blocks until all datasets are loaded or the timeout in seconds has passed
+        :return: True when all datasets are loaded
+        """
+        return self.__ready.wait(timeout)
 
     def write_details(self, text):
         if self.__verbose:
@@ -61,7 +255,7 @@ class Logic:
         """
         :return:
         """
-        df = self.__df_match_list
+        df = self.__table('match_header')['Frame']
         filter_league = df.League == league
         df = df.loc[filter_league].sort_values(['Match Date'], ascending=False)
         dict_all_headers = df.to_dict(orient='records')
@@ -77,9 +271,7 @@ class Logic:
         :param match_id:
         :return:
         """
-        df = self.__df_match_list
-        f_match_id = (df.MatchId == match_id)
-        single_match = df.loc[f_match_id].to_dict(orient='records')[0]
+        single_match = self.__match_rows('match_header', match_id).to_dict(orient='records')[0]
         self.__home_team = single_match['HomeTeam']
         self.__away_team = single_match['AwayTeam']
         home_score = single_match['Score Home']
@@ -92,7 +284,7 @@ class Logic:
         """
         :return: All available leagues in the dataset
         """
-        df = self.__df_match_list
+        df = self.__table('match_header')['Frame']
         list_leagues = df.League.unique().tolist()
         return list_leagues
 
@@ -101,9 +293,7 @@ class Logic:
         :param match_id:
         :return:
         """
-        df = self.__df_cumulative_score
-        f_match_id = df.MatchId == match_id
-        df = df.loc[f_match_id]
+        df = self.__match_rows('cumulative_score', match_id)
         cols = ['Away', 'Home', 'MinuteRound']
         df = df[cols]
 
@@ -166,9 +356,7 @@ class Logic:
         :param statistical_category:
         :return:
         """
-        df = self.__df_player_stat
-        filter_match = df.MatchId == match_id
-        df = df.loc[filter_match]
+        df = self.__match_rows('player_stat', match_id)
         the_column = statistical_category
         cols = ['MatchId', 'HomeAway', 'Starter', the_column]
         df = df[cols]
@@ -201,10 +389,8 @@ class Logic:
         return figure_stat_cat_starter_bench
 
     def cumulative_score(self, match_id):
-        df = self.__df_cumulative_score
         _df_temp = self.match_title(match_id)  # refresh home & away team values
-        f_match = df.MatchId == match_id
-        df = df.loc[f_match]
+        df = self.__match_rows('cumulative_score', match_id)
         x_minutes = df['MinuteRound']
         y_home = df['Home']
         y_away = df['Away']
@@ -243,9 +429,7 @@ class Logic:
         :param match_id:
         :return:
         """
-        df = self.__df_player_stat
-        f_match = df.MatchId == match_id
-        df = df.loc[f_match]
+        df = self.__match_rows('player_stat', match_id)
         df = df.copy()
         df['MIN'] = df.MIN.astype(str).str[-10:-5]
 
@@ -258,8 +442,7 @@ class Logic:
         return dict_home, dict_away
 
     def data_efficiency(self, match_id):
-        df = self.__df_player_stat
-        df = df.loc[(df.MatchId == match_id)]
+        df = self.__match_rows('player_stat', match_id)
         filter_home = (df.HomeAway == 'Home')
         filter_away = (df.HomeAway == 'Away')
         df_home = df.loc[filter_home][['Player', 'Efficiency', 'Team']].sort_values(by=['Efficiency'])
@@ -304,11 +487,10 @@ class Logic:
     '''
 
     def assist(self, match_id):
-        df = self.__df_assist
-        f_match_id = df.MatchId == match_id
+        df = self.__match_rows('assists', match_id)
 
         columns = ['Assist', 'PeriodName', 'Team', 'HomeAway']
-        df_assist = df.loc[f_match_id][columns].groupby(['PeriodName', 'Team', 'HomeAway']).count().reset_index()
+        df_assist = df[columns].groupby(['PeriodName', 'Team', 'HomeAway']).count().reset_index()
 
         # get Home Away teams
         d = df_assist[['HomeAway', 'Team']].drop_duplicates().to_dict(orient='split')
@@ -0,0 +1,107 @@
+from datetime import datetime
+import hashlib
+import json
+import threading
+from logic.storage import default_storage
+
+
+def match_status(data_summary):
+    """
+    :param data_summary: parsed MatchSummaryViewModel
+    :return: 'scheduled' if the match date is in the future, 'finished' if the match date has passed
+             and periods are registered, otherwise 'live'
+    """
+    match_date = (data_summary.get('Date') or '')[:10]
+    today = datetime.now().strftime("%Y-%m-%d")
+    if match_date > today:
+        return 'scheduled'
+    if match_date < today and data_summary.get('Periods'):
+        return 'finished'
+    return 'live'
+
+
+class Manifest:
+    """
+    Persistent record of every downloaded match, keyed by match id:
+    the content hash of each view model, the time it was fetched, the match status and
+    whether the current content has been analysed.
+    Finished matches are not fetched again and unchanged view models are not saved again.
+    """
+    def __init__(self, key='blno/MANIFEST/ingestion_manifest.json', storage=None):
+        self.__key = key
+        self.__storage = storage if storage is not None else default_storage()
+        self.__lock = threading.Lock()
+        self.__entries = self.__load()
+
+    def __load(self):
+        try:
+            body = self.__storage.read(self.__key)
+        except KeyError:
+            return {}
+        return json.loads(body)
+
+    def save(self):
+        with self.__lock:
+            body = json.dumps(self.__entries)
+        self.__storage.write(self.__key, body)
+
+    def is_finished(self, match_id):
+        entry = self.__entries.get(str(match_id))
+        # matches marked as analysed before they were downloaded have no status
+        return entry is not None and entry.get('Status') == 'finished'
+
+    def has_changed(self, match_id, view_model, body):
+        """
+        :return: True if the view model is new or its content differs from the last download
+        """
+        entry = self.__entries.get(str(match_id))
+        if entry is None:
+            return True
+        return entry['Hashes'].get(view_model) != self.__hash(body)
+
+    def changed_view_models(self, match_id, view_models):
+        """
+        :param view_models: dictionary with view model name as key and json text as value
+        :return: list of view models whose content is new or changed, the ones to save
+        """
+        return [search for search, body in view_models.items() if self.has_changed(match_id, search, body)]
+
+    def commit(self, match_id, view_models, changed):
+        """
+        Records a download of a match, called only after the changed view models are saved:
+        if saving fails, the match keeps its old hashes and status and is saved again on the next run
+        :param view_models: dictionary with view model name as key and json text as value
+        :param changed: view models that were saved, from changed_view_models
+        """
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        status = 'live'
+        if 'MatchSummaryViewModel' in view_models:
+            status = match_status(json.loads(view_models['MatchSummaryViewModel']))
+        with self.__lock:
+            entry = self.__entries.setdefault(str(match_id), {'Hashes': {}, 'Analyzed': False})
+            entry['FetchedTime'] = now
+            entry['Status'] = status
+            for search in changed:
+                entry['Hashes'][search] = self.__hash(view_models[search])
+            if changed:
+                entry['Analyzed'] = False
+
+    def needs_analysis(self, match_id):
+        entry = self.__entries.get(str(match_id))
+        return entry is not None and not entry['Analyzed']
+
+    def mark_analyzed(self, match_id):
+        with self.__lock:  # matches from before the manifest get an entry without hashes
+            self.__entries.setdefault(str(match_id), {'Hashes': {}})['Analyzed'] = True
+
+    def get_matches_to_analyze(self):
+        return [int(match_id) for match_id, entry in self.__entries.items() if not entry['Analyzed']]
+
+    def get_entry(self, match_id):
+        return self.__entries.get(str(match_id))
+
+    @staticmethod
+    def __hash(body):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        return hashlib.sha256(body).hexdigest()
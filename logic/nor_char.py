@@ -0,0 +1,34 @@
+import re
+from logic.dictionary import Dictionary
+
+
+def _escaped(text, hex_format):
+    """
+    :return: text with every non-ascii character written as a json \\u escape
+    """
+    return ''.join(char if ord(char) < 128 else '\\u' + format(ord(char), hex_format) for char in text)
+
+
+_replacement = dict(Dictionary.nor_char_replacement)
+# json written with only ascii characters has the broken sequences as escapes, e.g. "Bj\u00c3\u00b8rn"
+for _key, _value in Dictionary.nor_char_replacement.items():
+    for _hex_format in ('04x', '04X'):
+        if _escaped(_key, _hex_format) != _key:
+            _replacement[_escaped(_key, _hex_format)] = _escaped(_value, _hex_format)
+_replacement_bytes = {key.encode('utf-8'): value.encode('utf-8') for key, value in _replacement.items()}
+
+# one alternation over all broken sequences so the text is scanned only once
+_pattern = re.compile('|'.join(re.escape(key) for key in _replacement))
+_pattern_bytes = re.compile(b'|'.join(re.escape(key) for key in _replacement_bytes))
+
+
+def repair_nor_chars(text):
+    """
+    Replaces mojibake and html entities with norwegian letters in a single pass.
+    Meant to be run on the raw json text before it is parsed, mojibake written as \\u escapes is repaired too.
+    :param text: str, or utf-8 encoded bytes
+    :return: repaired text of the same type as the input
+    """
+    if isinstance(text, (bytes, bytearray)):
+        return _pattern_bytes.sub(lambda m: _replacement_bytes[m.group(0)], text)
+    return _pattern.sub(lambda m: _replacement[m.group(0)], text)
@@ -0,0 +1,184 @@
+"""
+Runs Analysis.run_all_analyses for many matches on a pool of processes, e.g. to reprocess all historical
+leagues after a change in one of the analyses:
+
+    python -m logic.runner 7032979 7032980 7032981 --workers 8 --save
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from logic.analysis import Analysis
+from logic.bundle import default_output
+from logic.instrumentation import pop_records
+from logic.manifest import Manifest
+from logic.season import SeasonAggregates
+from logic.snapshot import update_snapshots
+from logic.storage import default_storage, set_default_storage
+from logic.utility import Utility, prefetch_staging_files
+
+
+def _init_worker(storage):
+    if storage is not None:
+        set_default_storage(storage)
+
+
+def _failed_results(list_match_id, error):
+    return [{'MatchId': match_id, 'Status': 'failed', 'Seconds': 0.0, 'Error': repr(error), 'Stages': []}
+            for match_id in list_match_id]
+
+
+def analyze_matches(list_match_id, dry_run=True, storage=None, output=None, collect_player_stat=False):
+    """
+    Analyses a chunk of matches, the staging files of the whole chunk are fetched at once.
+    Defined on module level so it can run in a worker process.
+    A failing match does not stop the others in the chunk.
+    :param collect_player_stat: if True, the results have League and PlayerStat of the analysed matches
+    :return: list with one dictionary per match: MatchId, Status ('ok', 'missing' or 'failed'), Seconds, Error
+             and Stages, the records of logic.instrumentation
+    """
+    try:
+        if storage is None:
+            storage = default_storage()
+        dict_prefetched, list_missing = prefetch_staging_files(list_match_id, storage=storage)
+    except Exception as e:
+        return _failed_results(list_match_id, e)
+    results = [{'MatchId': match_id, 'Status': 'missing', 'Seconds': 0.0, 'Error': None, 'Stages': []}
+               for match_id in list_missing]
+    for match_id, prefetched in dict_prefetched.items():
+        start = time.perf_counter()
+        result = {'MatchId': match_id, 'Status': 'ok', 'Seconds': 0.0, 'Error': None}
+        try:
+            utility = Utility(match_id=match_id, dry_run=dry_run, storage=storage, prefetched=prefetched, output=output)
+            analysis = Analysis(match_id, dry_run=dry_run, storage=storage, utility=utility)
+            analysis.run_all_analyses()
+            if collect_player_stat:
+                result['League'] = analysis.get_league()
+                result['PlayerStat'] = analysis.get_player_stat()
+        except Exception as e:
+            result['Status'] = 'failed'
+            result['Error'] = repr(e)
+        result['Seconds'] = time.perf_counter() - start
+        result['Stages'] = pop_records(match_id)
+        results.append(result)
+    return results
+
+
+class SeasonRunner:
+    """
+    Analyses many matches on a process pool. Every process saves the results of its matches as soon as they are done.
+
+    workers: number of processes, the number of CPUs if None; with 1 the matches are analysed in this process
+    chunk_size: number of matches given to a process at once, their staging files are fetched together
+    dry_run: if True, do not write to storage and do not use the manifest
+    storage: storage the worker processes use, default_storage() of each process if None.
+             With more than one worker it has to be picklable (LocalStorage) and shared by all processes,
+             S3 is best reached through HUBIE_STORAGE so that every process creates its own client.
+    mark_analyzed: if True, the analysed matches are marked in the ingestion manifest
+    output: 'folders', 'bundle' or 'both', default_output() of each process if None
+    season: SeasonAggregates, updated here with the player statistic of every analysed match
+    snapshot: if True, the analysed matches are written to the snapshots of the web app's folders after the run
+    """
+    def __init__(self, list_match_id, workers=None, chunk_size=8, dry_run=True, storage=None, mark_analyzed=False,
+                 output=None, season=None, snapshot=False):
+        self.__list_match_id = list(list_match_id)
+        self.__workers = workers or os.cpu_count() or 1
+        self.__chunk_size = chunk_size
+        self.__dry_run = dry_run
+        self.__storage = storage
+        self.__output = output
+        self.__season = season
+        self.__snapshot = snapshot
+        self.__manifest = None
+        if mark_analyzed and not self.__dry_run:
+            self.__manifest = Manifest(storage=storage)
+
+        self.__results = []
+        self.__start = 0.0
+        self.__elapsed = 0.0
+
+    def run(self):
+        """
+        :return: list with one dictionary per match: MatchId, Status ('ok', 'missing' or 'failed'), Seconds, Error
+        """
+        self.__start = time.perf_counter()
+        self.__results = []
+        chunks = [self.__list_match_id[i:i + self.__chunk_size]
+                  for i in range(0, len(self.__list_match_id), self.__chunk_size)]
+        if self.__workers == 1:
+            for chunk in chunks:
+                self.__collect(analyze_matches(chunk, self.__dry_run, self.__storage, self.__output,
+                                               self.__season is not None))
+        else:
+            with ProcessPoolExecutor(max_workers=self.__workers, initializer=_init_worker,
+                                     initargs=(self.__storage,)) as executor:
+                futures = {executor.submit(analyze_matches, chunk, self.__dry_run, None, self.__output,
+                                           self.__season is not None): chunk
+                           for chunk in chunks}
+                for future in as_completed(futures):
+                    try:
+                        results = future.result()
+                    except Exception as e:  # e.g. BrokenProcessPool, the other chunks go on
+                        results = _failed_results(futures[future], e)
+                    self.__collect(results)
+        self.__elapsed = time.perf_counter() - self.__start
+        if self.__manifest is not None:
+            self.__manifest.save()
+        if self.__season is not None and not self.__dry_run:
+            self.__season.save()
+        # the snapshots are made from the folders, there are none if only bundles are written
+        if self.__snapshot and not self.__dry_run and (self.__output or default_output()) != 'bundle':
+            update_snapshots([result['MatchId'] for result in self.__results if result['Status'] == 'ok'],
+                             self.__storage)
+        print("Analysed {} matches in {:.1f}s ({:.2f} matches/s), {} failed".format(
+            len(self.__results), self.__elapsed, self.throughput(), len(self.get_failed())))
+        return self.__results
+
+    def __collect(self, results):
+        for result in results:
+            self.__results.append(result)
+            if result['Status'] == 'failed':
+                print("Match Id {} failed: {}".format(result['MatchId'], result['Error']))
+            elif result['Status'] == 'ok':
+                if self.__manifest is not None:
+                    self.__manifest.mark_analyzed(result['MatchId'])
+                if self.__season is not None:
+                    self.__season.update(result['MatchId'], result.pop('League'), result.pop('PlayerStat'))
+        print("{}/{} matches done ({:.2f} matches/s)".format(
+            len(self.__results), len(self.__list_match_id), len(self.__results) / (time.perf_counter() - self.__start)))
+
+    ######
+    ## Getters
+    ######
+
+    def get_results(self):
+        return self.__results
+
+    def get_failed(self):
+        return [result for result in self.__results if result['Status'] == 'failed']
+
+    def throughput(self):
+        """
+        :return: matches per second of the last run
+        """
+        if self.__elapsed == 0.0:
+            return 0.0
+        return len(self.__results) / self.__elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Analyse matches on a pool of processes")
+    parser.add_argument('match_ids', nargs='*', type=int, help="match ids, the ones waiting in the manifest if none")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=8)
+    parser.add_argument('--save', action='store_true', help="save the results, otherwise it is a dry run")
+    parser.add_argument('--output', choices=['folders', 'bundle', 'both'], default=None,
+                        help="one file per table, one bundle per match or both, HUBIE_OUTPUT if not given")
+    parser.add_argument('--season', action='store_true', help="update the season aggregates and leaderboards")
+    parser.add_argument('--snapshot', action='store_true', help="update the snapshots the web app loads")
+    args = parser.parse_args()
+
+    list_match_id = args.match_ids or Manifest().get_matches_to_analyze()
+    SeasonRunner(list_match_id, workers=args.workers, chunk_size=args.chunk_size, dry_run=not args.save,
+                 mark_analyzed=True, output=args.output, season=SeasonAggregates() if args.season else None,
+                 snapshot=args.snapshot).run()
@@ -0,0 +1,142 @@
+import heapq
+import json
+import threading
+import pandas as pd
+from logic.storage import default_storage
+
+SEASON_STATS = ['Points', '2FGM', '2FGA', '3FGM', '3FGA', 'FTM', 'FTA', 'DREB', 'OREB', 'REB', 'AST', 'STL', 'TOV',
+                'BLK', 'FLS', 'Efficiency', 'Seconds']
+
+
+class SeasonAggregates:
+    """
+    Per-player season totals of every league, updated one match at a time from the player_stat of the match,
+    and top-N leaderboards of every stat by total and by average per game.
+    The contribution of every match is kept, so an analysed again match replaces its old numbers instead of
+    counting twice.
+
+    top_n: length of the leaderboards
+    min_games: games a player needs to be on the leaderboards by average per game
+    """
+    def __init__(self, key='blno/SEASON/season_aggregates.json', storage=None, top_n=10, min_games=1):
+        self.__key = key
+        self.__storage = storage if storage is not None else default_storage()
+        self.__top_n = top_n
+        self.__min_games = min_games
+        self.__lock = threading.Lock()
+        self.__matches, self.__totals, self.__leaderboards = self.__load()
+
+    def __load(self):
+        try:
+            body = self.__storage.read(self.__key)
+        except KeyError:
+            return {}, {}, {}
+        data = json.loads(body)
+        return data['Matches'], data['Totals'], data['Leaderboards']
+
+    def save(self):
+        with self.__lock:
+            body = json.dumps({'Matches': self.__matches, 'Totals': self.__totals, 'Leaderboards': self.__leaderboards},
+                              ensure_ascii=False)
+        self.__storage.write(self.__key, body)
+
+    def update(self, match_id, league, df_player_stat):
+        """
+        Adds a match to the totals of its league, a match added before is replaced
+        :param df_player_stat: player_stat of the match as made by Analysis.player_statistic
+        """
+        df = df_player_stat.assign(Seconds=pd.to_timedelta(df_player_stat.MIN).dt.total_seconds().round())
+        players = {}
+        for row in df.to_dict(orient='records'):
+            stats = {stat: int(row[stat]) for stat in SEASON_STATS}
+            player = str(row['Player']).lstrip('*')  # starters have a star in front of their name
+            players[str(row['PlayerId'])] = {'Player': player, 'Team': row['Team'], 'Stats': stats}
+
+        with self.__lock:
+            leagues = {league}
+            old = self.__matches.get(str(match_id))
+            if old is not None:
+                self.__add(old['League'], old['Players'], -1)
+                leagues.add(old['League'])
+            self.__matches[str(match_id)] = {'League': league, 'Players': players}
+            self.__add(league, players, 1)
+            for changed_league in leagues:
+                self.__rank(changed_league)
+
+    def remove(self, match_id):
+        """
+        Takes the numbers of a match out of the totals
+        """
+        with self.__lock:
+            old = self.__matches.pop(str(match_id), None)
+            if old is not None:
+                self.__add(old['League'], old['Players'], -1)
+                self.__rank(old['League'])
+
+    def __add(self, league, players, sign):
+        totals = self.__totals.setdefault(league, {})
+        for player_id, player in players.items():
+            total = totals.setdefault(player_id, {'Player': player['Player'], 'Team': player['Team'], 'Games': 0,
+                                                  'Stats': dict.fromkeys(SEASON_STATS, 0)})
+            total['Games'] += sign
+            for stat, value in player['Stats'].items():
+                total['Stats'][stat] += sign * value
+            if sign > 0:  # a player can change team during the season, the last match counts
+                total['Player'], total['Team'] = player['Player'], player['Team']
+            if total['Games'] == 0:
+                del totals[player_id]
+
+    def __rank(self, league):
+        """
+        Ranks only the players of one league, at most a few hundred, so the leaderboards can be read without a scan
+        """
+        totals = self.__totals.get(league, {})
+        regulars = [item for item in totals.items() if item[1]['Games'] >= self.__min_games]
+        boards = {}
+        for stat in SEASON_STATS:
+            by_total = heapq.nlargest(self.__top_n, totals.items(), key=lambda item: item[1]['Stats'][stat])
+            by_average = heapq.nlargest(self.__top_n, regulars,
+                                        key=lambda item: item[1]['Stats'][stat] / item[1]['Games'])
+            boards[stat] = {'Total': [self.__entry(player_id, total, total['Stats'][stat])
+                                      for player_id, total in by_total],
+                            'PerGame': [self.__entry(player_id, total, total['Stats'][stat] / total['Games'])
+                                        for player_id, total in by_average]}
+        self.__leaderboards[league] = boards
+
+    @staticmethod
+    def __entry(player_id, total, value):
+        return {'PlayerId': int(player_id), 'Player': total['Player'], 'Team': total['Team'],
+                'Games': total['Games'], 'Value': value}
+
+    ######
+    ## Getters
+    ######
+
+    def get_leaderboard(self, league, stat, per_game=False):
+        """
+        :param stat: one of SEASON_STATS
+        :param per_game: if True, ranked by average per game, otherwise by season total
+        :return: list of the top players, best first: PlayerId, Player, Team, Games and Value
+        """
+        board = self.__leaderboards.get(league, {}).get(stat)
+        if board is None:
+            return []
+        return board['PerGame' if per_game else 'Total']
+
+    def get_player_totals(self, league):
+        """
+        :return: DataFrame with one row per player: totals of all stats, Games and the averages per game
+        """
+        rows = [dict({'PlayerId': int(player_id), 'Player': total['Player'], 'Team': total['Team'],
+                      'Games': total['Games']}, **total['Stats'])
+                for player_id, total in self.__totals.get(league, {}).items()]
+        df = pd.DataFrame(rows, columns=['PlayerId', 'Player', 'Team', 'Games'] + SEASON_STATS)
+        for stat in SEASON_STATS:
+            df[stat + 'PerGame'] = df[stat] / df.Games
+        return df
+
+    def get_leagues(self):
+        return list(self.__totals.keys())
+
+    def get_match_ids(self):
+        return [int(match_id) for match_id in self.__matches]
@@ -0,0 +1,262 @@
+"""
+Columnar snapshots of the result folders the web app reads, blno/SNAPSHOT/<folder>.parquet:
+the rows of all matches of a folder in one file, so a web worker starts with one read per folder.
+The versions of the files a snapshot is made from are kept in its metadata, files added or changed since
+the snapshot was written, e.g. of matches analysed again without updating the snapshot, are read themselves.
+Snapshots need pyarrow; without it they are not written and the folders are read file by file.
+
+Every analysis that saves a match also writes the small change marker blno/CHANGES.json, the web app asks for
+its version when it polls and lists the folders only when it has changed.
+
+Rebuild all snapshots from the folders: python -m logic.snapshot
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO, StringIO
+import json
+import uuid
+import pandas as pd
+from logic.compression import decompress
+from logic.storage import default_storage
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # snapshots are optional, the json lines files are always there
+    pyarrow = None
+
+SNAPSHOT_FOLDER = 'blno/SNAPSHOT/'
+SNAPSHOT_FOLDERS = ["match_header", "player_stat", "cumulative_score", "assists"]
+CHANGES_KEY = 'blno/CHANGES.json'
+# game clock in the files written before it was kept in integer minutes: '1900-01-01 00:12:00' or '12-<seconds>'
+_old_clock = r'^(?:\d{4}-\d{2}-\d{2}[ T](\d{2}):(\d{2}):\d{2}(?:\.\d+)?Z?|(\d{2})--?\d+)$'
+
+
+def snapshot_key(folder):
+    return SNAPSHOT_FOLDER + folder + '.parquet'
+
+
+def key_match_id(key):
+    """
+    :return: match id of a per-match file like 'blno/player_stat/7032979.json', None for other files
+    """
+    file_name = key.rsplit('/', 1)[-1]
+    if file_name.endswith('.json') and file_name[:-5].isdigit():
+        return int(file_name[:-5])
+    return None
+
+
+def mark_changed(list_match_id, storage=None):
+    """
+    Writes the change marker after the files of the matches were saved.
+    The body is different at every write, so the version (ETag on S3) changes even if the same matches are marked
+    """
+    if storage is None:
+        storage = default_storage()
+    body = json.dumps({'Time': datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 'Id': uuid.uuid4().hex,
+                       'MatchIds': [int(match_id) for match_id in list_match_id]})
+    storage.write(CHANGES_KEY, body)
+
+
+def changes_version(storage):
+    """
+    :return: version of the change marker, None if it was never written
+    """
+    try:
+        return storage.version(CHANGES_KEY)
+    except KeyError:
+        return None
+
+
+def folder_versions(folder, storage):
+    """
+    :return: dictionary with key and version of the json lines files of a folder
+    """
+    return {key: version for key, version in storage.list_versions("blno/" + folder + "/").items()
+            if key_match_id(key) is not None}
+
+
+def read_json_files(keys, storage, workers=16):
+    """
+    The files are fetched and decompressed concurrently, then all lines are parsed together with one read_json
+    :return: dataframe with the rows of all files
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        bodies = list(executor.map(lambda key: decompress(storage.read(key)).rstrip(b'\n'), keys))
+    bodies = [body for body in bodies if body]  # a match without rows has an empty file
+    if not bodies:
+        return pd.DataFrame()
+    return normalise_clock(pd.read_json(StringIO(b'\n'.join(bodies).decode('utf-8')), lines=True))
+
+
+def normalise_clock(df):
+    """
+    Brings the Minute and MinuteRound values of files written before the game clock was kept in integer minutes
+    to the minutes the newer files have, so a folder with files of both has one type per column.
+    Other values, e.g. period times like '04:10', are kept
+    """
+    old_minute = None
+    for column in ['Minute', 'MinuteRound']:
+        if column not in df:
+            continue
+        if df[column].dtype == object:
+            parts = df[column].astype(str).str.extract(_old_clock).astype(float)
+            minutes = (parts[0] * 60 + parts[1]).fillna(parts[2])
+        else:
+            minutes = pd.Series(float('nan'), index=df.index)
+        if column == 'Minute':
+            old_minute = minutes
+        elif old_minute is not None:  # the old MinuteRound of the cumulative score was cut from the text of Minute
+            minutes = old_minute.fillna(minutes)
+        is_old = minutes.notnull()
+        if is_old.any():
+            values = df[column].astype(object)
+            values.loc[is_old] = minutes.loc[is_old].astype('int64')
+            df[column] = _as_numbers(values)
+    return df
+
+
+def _as_numbers(values):
+    """
+    :return: values as integers, or as they are if some of them are not numbers
+    """
+    numbers = pd.to_numeric(values, errors='coerce')
+    if numbers.notnull().sum() < values.notnull().sum():
+        return values
+    if numbers.notnull().all() and (numbers % 1 == 0).all():
+        return numbers.astype('int64')
+    return numbers
+
+
+def _arrow_table(df):
+    try:
+        return pyarrow.Table.from_pandas(df, preserve_index=False)
+    except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError):
+        # a column with values of different types, e.g. numbers and text from files of different versions, as text
+        mixed = [column for column in df
+                 if df[column].dtype == object and df[column].dropna().map(type).nunique() > 1]
+        df = df.assign(**{column: df[column].map(lambda value: value if pd.isna(value) else str(value))
+                          for column in mixed})
+        return pyarrow.Table.from_pandas(df, preserve_index=False)
+
+
+def read_snapshot(folder, storage=None):
+    """
+    :return: dataframe of the snapshot and a dictionary with key and version of the files it was made from,
+             None and an empty dictionary if there is no snapshot
+    """
+    if pyarrow is None:
+        return None, {}
+    if storage is None:
+        storage = default_storage()
+    try:
+        body = storage.read(snapshot_key(folder))
+    except KeyError:
+        return None, {}
+    table = pyarrow.parquet.read_table(BytesIO(body))
+    # snapshots written before the versions were kept give none, all their matches are read from the files again
+    versions = json.loads(table.schema.metadata[b'hubie']).get('Versions', {})
+    df = table.to_pandas()
+    # lists come back as numpy arrays, the json lines files give python lists
+    for name, field_type in zip(table.schema.names, table.schema.types):
+        if pyarrow.types.is_list(field_type):
+            df[name] = df[name].map(lambda value: value.tolist() if value is not None else None)
+    return df, versions
+
+
+def write_snapshot(folder, df, versions, storage=None):
+    """
+    :param versions: dictionary with key and version of the files the snapshot is made from, listed before they
+                     were read, also the files of matches without rows in this folder
+    """
+    if pyarrow is None:
+        return
+    if storage is None:
+        storage = default_storage()
+    table = _arrow_table(df.reset_index(drop=True))
+    metadata = dict(table.schema.metadata or {})
+    metadata[b'hubie'] = json.dumps({'Versions': versions}, sort_keys=True).encode('utf-8')
+    buffer = BytesIO()
+    pyarrow.parquet.write_table(table.replace_schema_metadata(metadata), buffer, compression='zstd')
+    storage.write(snapshot_key(folder), buffer.getvalue())
+
+
+def load_folder(folder, storage=None, workers=16, versions=None):
+    """
+    Loads a folder from its snapshot and the files that were added or changed since the snapshot was written
+    :param versions: dictionary with key and version of the files in the folder, listed if None
+    :return: dataframe with the rows of all matches
+    """
+    if storage is None:
+        storage = default_storage()
+    if versions is None:
+        versions = folder_versions(folder, storage)
+    df, snapshot_versions = read_snapshot(folder, storage)
+    current = {key_match_id(key) for key, version in versions.items() if snapshot_versions.get(key) == version}
+    stale_keys = [key for key in versions if key_match_id(key) not in current]
+    df_newer = read_json_files(stale_keys, storage, workers)
+    if df is None:
+        return df_newer
+    # rows of files changed or removed since the snapshot was written
+    if 'MatchId' in df and len(current) < len(snapshot_versions):
+        df = df.loc[df.MatchId.isin(list(current))].reset_index(drop=True)
+    if df_newer.empty:
+        return df
+    return pd.concat([df, df_newer], ignore_index=True)
+
+
+def update_snapshots(list_match_id, storage=None, folders=SNAPSHOT_FOLDERS, workers=16):
+    """
+    Replaces the rows of the matches in the snapshots with the rows in their json lines files,
+    called after the matches were analysed
+    """
+    if pyarrow is None:
+        return
+    if storage is None:
+        storage = default_storage()
+    set_match_id = set(list_match_id)
+    failed = []
+    for folder in folders:
+        try:
+            df, snapshot_versions = read_snapshot(folder, storage)
+            versions = {key: version for key, version in folder_versions(folder, storage).items()
+                        if key_match_id(key) in set_match_id}
+            if df is not None and 'MatchId' in df:
+                df = df.loc[~df.MatchId.isin(set_match_id)]
+            frames = [frame for frame in [df, read_json_files(list(versions), storage, workers)]
+                      if frame is not None and not frame.empty]
+            df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+            versions.update({key: version for key, version in snapshot_versions.items()
+                             if key_match_id(key) not in set_match_id})
+            write_snapshot(folder, df, versions, storage)
+        except Exception as e:  # the old snapshot stays, the web app reads the newer files itself
+            print("Snapshot of {} failed: {!r}".format(folder, e))
+            failed.append(folder)
+            continue
+        print("Snapshot of {} updated with {} matches".format(folder, len(list_match_id)))
+    return failed
+
+
+def rebuild_snapshots(storage=None, folders=SNAPSHOT_FOLDERS, workers=16):
+    """
+    Writes the snapshots again from all json lines files of the folders
+    """
+    if pyarrow is None:
+        raise ImportError("snapshots need the pyarrow package")
+    if storage is None:
+        storage = default_storage()
+    failed = []
+    for folder in folders:
+        try:
+            versions = folder_versions(folder, storage)
+            write_snapshot(folder, read_json_files(list(versions), storage, workers), versions, storage)
+        except Exception as e:
+            print("Snapshot of {} failed: {!r}".format(folder, e))
+            failed.append(folder)
+            continue
+        print("Snapshot of {} written with {} matches".format(folder, len(versions)))
+    return failed
+
+
+if __name__ == '__main__':
+    rebuild_snapshots()
@@ -0,0 +1,177 @@
+"""
+Lineup stints: the parts of a match in which none of the ten players on the court changes.
+"""
+from bisect import bisect_right
+import numpy as np
+import pandas as pd
+from logic.dictionary import Dictionary
+
+FIELD_GOALS = [200443, 200581, 200442, 200580]
+FREE_THROWS = [200444, 200445]
+
+
+def lineup_text(lineup):
+    """
+    :return: lineup as comma separated player ids, the way lineups are saved
+    """
+    return ','.join(str(player_id) for player_id in lineup)
+
+
+def possessions(field_goals, free_throws, offensive_rebounds, turnovers):
+    """
+    Possessions estimated from the box score: FGA + 0.44 * FTA - OREB + TOV
+    """
+    return field_goals + 0.44 * free_throws - offensive_rebounds + turnovers
+
+
+def ratings(df):
+    """
+    Adds PlusMinus and points per 100 possessions: OffRating, DefRating and NetRating
+    :param df: DataFrame with PointsFor, PointsAgainst, PossessionsFor and PossessionsAgainst
+    """
+    df['PlusMinus'] = df.PointsFor - df.PointsAgainst
+    df['OffRating'] = 100 * df.PointsFor / df.PossessionsFor.where(df.PossessionsFor > 0)
+    df['DefRating'] = 100 * df.PointsAgainst / df.PossessionsAgainst.where(df.PossessionsAgainst > 0)
+    df['NetRating'] = df.OffRating - df.DefRating
+    return df
+
+
+class Stints:
+    """
+    Turns the lineup changes of Utility.get_lineup_changes into stints and attaches the points and possessions
+    of both teams. An event counts for the lineup on the floor at that event in the order of the events,
+    the same lineup Utility.get_event_lineups gives it, e.g. free throws after a substitution at the same second.
+    Stints are sorted by start, so the lineups on the court at any second are found with a binary search.
+    """
+    def __init__(self, utility):
+        self.__match_id = int(utility.get_match_summary().MatchId.iloc[0])
+        self.__dict_teams = utility.get_team_names()
+        self.__df_stints = self.__stints(utility.get_lineup_changes(), utility.get_events(), utility.get_game_length())
+        self.__starts = self.__df_stints.Start.tolist()
+
+    def __stints(self, changes, events, game_length):
+        """
+        Return: DataFrame with one row per stint: MatchId, Stint, Start, End, Seconds, HomeLineup, AwayLineup
+        (tuples of sorted player ids) and the Points and Possessions of both teams
+        """
+        df = changes[['Event', 'GameSecond', 'HomeLineup', 'AwayLineup']].rename(columns={'GameSecond': 'Start'})
+        df['End'] = np.append(df.Start.to_numpy()[1:], game_length)
+
+        # points and possessions of both teams from every lineup change on: the last change before the event
+        change = np.searchsorted(df.Event.to_numpy(), events.index.to_numpy(), side='right') - 1
+        is_shot = (events.MatchEventType == 'Shot').to_numpy()
+        shot_result = events.ShotResult.to_numpy()
+        counts = pd.DataFrame({'Change': change, 'HomeAway': events.HomeAway.astype(object).to_numpy(),
+                               'Points': np.where(is_shot, pd.Series(shot_result).map(Dictionary.shot_result_points).fillna(0), 0),
+                               'FieldGoals': is_shot & np.isin(shot_result, FIELD_GOALS),
+                               'FreeThrows': is_shot & np.isin(shot_result, FREE_THROWS),
+                               'OffensiveRebounds': (events.MatchEventType == 'OffensiveRebound').to_numpy(),
+                               'Turnovers': (events.MatchEventType == 'Turnover').to_numpy()})
+        counts = counts.groupby(['Change', 'HomeAway']).sum()
+        counts['Possessions'] = possessions(counts.FieldGoals, counts.FreeThrows, counts.OffensiveRebounds,
+                                            counts.Turnovers)
+        counts = counts[['Points', 'Possessions']].unstack().reindex(index=range(len(df)), columns=pd.MultiIndex.from_product(
+            [['Points', 'Possessions'], ['Home', 'Away']])).fillna(0)
+        df['HomePoints'] = counts[('Points', 'Home')].to_numpy()
+        df['AwayPoints'] = counts[('Points', 'Away')].to_numpy()
+        df['HomePossessions'] = counts[('Possessions', 'Home')].to_numpy()
+        df['AwayPossessions'] = counts[('Possessions', 'Away')].to_numpy()
+
+        # a substitution followed by another one at the same second, with no event in between, is not a stint
+        not_sub = (events.MatchEventType != 'Substitution').to_numpy()
+        df['NoEvents'] = np.bincount(change[not_sub], minlength=len(df))
+        df = df.loc[(df.End > df.Start) | (df.NoEvents > 0)]
+        # changes where nobody changes (a player out and in again) do not start a new stint
+        changed = (df.HomeLineup != df.HomeLineup.shift()) | (df.AwayLineup != df.AwayLineup.shift())
+        df = df.groupby(changed.cumsum().to_numpy() - 1).agg(
+            Start=('Start', 'first'), End=('End', 'last'), HomeLineup=('HomeLineup', 'first'),
+            AwayLineup=('AwayLineup', 'first'), HomePoints=('HomePoints', 'sum'), AwayPoints=('AwayPoints', 'sum'),
+            HomePossessions=('HomePossessions', 'sum'), AwayPossessions=('AwayPossessions', 'sum'))
+        df['Seconds'] = df.End - df.Start
+        df['HomePoints'] = df.HomePoints.astype('int64')
+        df['AwayPoints'] = df.AwayPoints.astype('int64')
+        df.insert(0, 'Stint', range(len(df)))
+        df.insert(0, 'MatchId', self.__match_id)
+        columns = ['MatchId', 'Stint', 'Start', 'End', 'Seconds', 'HomeLineup', 'AwayLineup', 'HomePoints',
+                   'AwayPoints', 'HomePossessions', 'AwayPossessions']
+        return df[columns].reset_index(drop=True)
+
+    def on_court(self, second):
+        """
+        :param second: seconds since tip-off
+        :return: dictionary with the Home and Away lineups on the court at that second
+        """
+        stint = max(bisect_right(self.__starts, second) - 1, 0)
+        row = self.__df_stints.iloc[stint]
+        return {'Home': row.HomeLineup, 'Away': row.AwayLineup}
+
+    def __team_stints(self):
+        """
+        Return: the stints once from the side of every team, with For and Against instead of Home and Away
+        """
+        frames = []
+        for ha, other in [('Home', 'Away'), ('Away', 'Home')]:
+            df = self.__df_stints[['MatchId', 'Stint', 'Seconds']].copy()
+            df['HomeAway'] = ha
+            df['Team'] = self.__dict_teams[ha]
+            df['Lineup'] = self.__df_stints[ha + 'Lineup']
+            df['PointsFor'] = self.__df_stints[ha + 'Points']
+            df['PointsAgainst'] = self.__df_stints[other + 'Points']
+            df['PossessionsFor'] = self.__df_stints[ha + 'Possessions']
+            df['PossessionsAgainst'] = self.__df_stints[other + 'Possessions']
+            frames.append(df)
+        return pd.concat(frames, ignore_index=True)
+
+    def plus_minus(self):
+        """
+        :return: DataFrame with one row per player who played: seconds on the court, points for and against
+                 while on the court and plus/minus
+        """
+        df = self.__team_stints().explode('Lineup').dropna(subset=['Lineup']).rename(columns={'Lineup': 'Player'})
+        df['Player'] = df.Player.astype('int64')
+        df = df.groupby(['MatchId', 'Player', 'HomeAway', 'Team'], as_index=False)[
+            ['Seconds', 'PointsFor', 'PointsAgainst']].sum()
+        df['PlusMinus'] = df.PointsFor - df.PointsAgainst
+        return df
+
+    def lineup_ratings(self):
+        """
+        :return: DataFrame with one row per lineup of each team: seconds, points and possessions for and against,
+                 plus/minus and the ratings per 100 possessions; Lineup is comma separated player ids
+        """
+        df = self.__team_stints()
+        df['Lineup'] = df.Lineup.map(lineup_text)
+        df = df.groupby(['MatchId', 'HomeAway', 'Team', 'Lineup'], as_index=False)[
+            ['Seconds', 'PointsFor', 'PointsAgainst', 'PossessionsFor', 'PossessionsAgainst']].sum()
+        return ratings(df)
+
+    ######
+    ## Getters
+    ######
+
+    def get_stints(self):
+        return self.__df_stints
+
+
+def season_plus_minus(df_plus_minus):
+    """
+    :param df_plus_minus: plus_minus of many matches, e.g. the plus_minus folder
+    :return: DataFrame with one row per player and team: matches, seconds, points for and against and plus/minus
+    """
+    df = df_plus_minus.groupby(['Player', 'Team'], as_index=False).agg(
+        Matches=('MatchId', 'nunique'), Seconds=('Seconds', 'sum'), PointsFor=('PointsFor', 'sum'),
+        PointsAgainst=('PointsAgainst', 'sum'))
+    df['PlusMinus'] = df.PointsFor - df.PointsAgainst
+    return df.sort_values('PlusMinus', ascending=False, ignore_index=True)
+
+
+def season_lineup_ratings(df_lineup_ratings):
+    """
+    :param df_lineup_ratings: lineup_ratings of many matches, e.g. the lineup_ratings folder
+    :return: DataFrame with one row per lineup and team, summed over the matches, with the ratings of the sums
+    """
+    df = df_lineup_ratings.groupby(['Team', 'Lineup'], as_index=False).agg(
+        Matches=('MatchId', 'nunique'), Seconds=('Seconds', 'sum'), PointsFor=('PointsFor', 'sum'),
+        PointsAgainst=('PointsAgainst', 'sum'), PossessionsFor=('PossessionsFor', 'sum'),
+        PossessionsAgainst=('PossessionsAgainst', 'sum'))
+    return ratings(df).sort_values('Seconds', ascending=False, ignore_index=True)
@@ -0,0 +1,331 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+import boto3
+from botocore.config import Config
+
+
+class Storage:
+    """
+    Interface to the object store the pipeline reads from and writes to.
+    Keys are paths relative to the bucket or root directory, like 'blno/STAGING_IN/7032979_MatchEventsViewModel.json'.
+    A missing key raises KeyError.
+    """
+    def read(self, key):
+        """
+        :return: content of the object as bytes
+        """
+        raise NotImplementedError
+
+    def write(self, key, body, content_encoding=None):
+        """
+        :param body: bytes or str, str is saved as utf-8
+        :param content_encoding: encoding of a compressed body ('gzip', 'zstd'), kept as metadata where supported
+        """
+        raise NotImplementedError
+
+    def list(self, prefix):
+        """
+        :return: sorted list of all keys starting with prefix
+        """
+        raise NotImplementedError
+
+    def list_versions(self, prefix):
+        """
+        :return: dictionary with all keys starting with prefix and a version of the object,
+                 the version changes when the object is written again
+        """
+        raise NotImplementedError
+
+    def version(self, key):
+        """
+        :return: version of one object as in list_versions, without reading it
+        """
+        try:
+            return self.list_versions(key)[key]
+        except KeyError:
+            raise KeyError(key)
+
+    def exists(self, key):
+        try:
+            self.version(key)
+        except KeyError:
+            return False
+        return True
+
+    def read_many(self, keys, workers=16, errors=None):
+        """
+        Reads many objects concurrently over the same client
+        :param errors: if a dictionary is given, other errors than a missing key are put in it by key
+                       instead of raised, so one failing read does not lose the others
+        :return: dictionary with key and content as bytes, missing keys are left out
+        """
+        def read(key):
+            try:
+                return key, self.read(key)
+            except KeyError:
+                return key, None
+            except Exception as e:
+                if errors is None:
+                    raise
+                errors[key] = e
+                return key, None
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return {key: body for key, body in executor.map(read, keys) if body is not None}
+
+
+def _to_bytes(body):
+    if isinstance(body, str):
+        return body.encode('utf-8')
+    return bytes(body)
+
+
+class S3Storage(Storage):
+    """
+    Objects in an S3 bucket. One client is shared by all calls and all threads.
+    """
+    def __init__(self, bucket_name='hubie', client=None, max_pool_connections=32):
+        self.__bucket_name = bucket_name
+        if client is None:
+            client = boto3.session.Session().client('s3', config=Config(max_pool_connections=max_pool_connections))
+        self.__client = client
+
+    def read(self, key):
+        try:
+            return self.__client.get_object(Bucket=self.__bucket_name, Key=key)['Body'].read()
+        except self.__client.exceptions.NoSuchKey:
+            raise KeyError(key)
+
+    def write(self, key, body, content_encoding=None):
+        extra = {'ContentEncoding': content_encoding} if content_encoding else {}
+        self.__client.put_object(Bucket=self.__bucket_name, Key=key, Body=_to_bytes(body), **extra)
+
+    def list(self, prefix):
+        keys = []
+        paginator = self.__client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.__bucket_name, Prefix=prefix):
+            keys += [obj['Key'] for obj in page.get('Contents', [])]
+        return sorted(keys)
+
+    def list_versions(self, prefix):
+        versions = {}
+        paginator = self.__client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.__bucket_name, Prefix=prefix):
+            versions.update((obj['Key'], obj['ETag']) for obj in page.get('Contents', []))
+        return versions
+
+    def version(self, key):
+        try:
+            return self.__client.head_object(Bucket=self.__bucket_name, Key=key)['ETag']
+        except self.__client.exceptions.ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise KeyError(key)
+            raise
+
+
+
+class LocalStorage(Storage):
+    """
+    Objects as files in a local directory, the key is the path below root.
+    """
+    def __init__(self, root):
+        self.__root = os.path.abspath(root)
+
+    def __path(self, key):
+        return os.path.join(self.__root, *key.split('/'))
+
+    def read(self, key):
+        try:
+            with open(self.__path(key), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            raise KeyError(key)
+
+    def write(self, key, body, content_encoding=None):
+        path = self.__path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_to_bytes(body))
+        os.replace(tmp_path, path)  # readers never see a half written file
+
+    def list(self, prefix):
+        keys = []
+        for directory, _, files in os.walk(self.__root):
+            relative = os.path.relpath(directory, self.__root).replace(os.sep, '/')
+            for file_name in files:
+                key = file_name if relative == '.' else relative + '/' + file_name
+                if key.startswith(prefix) and not key.endswith('.tmp'):
+                    keys.append(key)
+        return sorted(keys)
+
+    def list_versions(self, prefix):
+        versions = {}
+        for key in self.list(prefix):
+            try:
+                stat = os.stat(self.__path(key))
+            except FileNotFoundError:  # removed since it was listed
+                continue
+            versions[key] = '{}-{}'.format(stat.st_mtime_ns, stat.st_size)
+        return versions
+
+    def version(self, key):
+        try:
+            stat = os.stat(self.__path(key))
+        except FileNotFoundError:
+            raise KeyError(key)
+        return '{}-{}'.format(stat.st_mtime_ns, stat.st_size)
+
+    def exists(self, key):
+        return os.path.isfile(self.__path(key))
+
+
+class MemoryStorage(Storage):
+    """
+    Objects in a dictionary, for tests and offline benchmarks.
+    """
+    def __init__(self, objects=None):
+        self.__objects = {key: _to_bytes(body) for key, body in (objects or {}).items()}
+        self.__versions = dict.fromkeys(self.__objects, 0)
+        self.__lock = threading.Lock()
+
+    def read(self, key):
+        return self.__objects[key]
+
+    def write(self, key, body, content_encoding=None):
+        with self.__lock:
+            self.__objects[key] = _to_bytes(body)
+            self.__versions[key] = self.__versions.get(key, 0) + 1
+
+    def list(self, prefix):
+        return sorted(key for key in list(self.__objects) if key.startswith(prefix))
+
+    def list_versions(self, prefix):
+        with self.__lock:
+            return {key: self.__versions[key] for key in sorted(self.__versions) if key.startswith(prefix)}
+
+    def version(self, key):
+        with self.__lock:
+            return self.__versions[key]
+
+    def exists(self, key):
+        return key in self.__objects
+
+
+class CachedStorage(Storage):
+    """
+    Read-through cache on local disk in front of another storage.
+    Keys under one of the cached prefixes are read from the cache without asking the backend for ttl seconds
+    after the copy was checked. After that the backend is asked for the version of the key (one HEAD request on S3),
+    and the object is downloaded again only if the backend has another version than the cached copy.
+    Writes go to both. The version of every cached copy and when it was checked are kept under .versions/
+    in the cache directory, so all processes sharing the directory use them.
+
+    ttl: seconds a cached copy is used without asking the backend, 0 asks on every read
+    """
+    def __init__(self, backend, cache_dir, prefixes=('blno/STAGING_IN/',), ttl=300):
+        self.__backend = backend
+        self.__cache = LocalStorage(cache_dir)
+        self.__prefixes = tuple(prefixes)
+        self.__ttl = ttl
+
+    def read(self, key):
+        if not key.startswith(self.__prefixes):
+            return self.__backend.read(key)
+        cached_version, checked = self.__cached_version(key)
+        now = time.time()
+        if cached_version is not None and now - checked < self.__ttl:
+            try:
+                return self.__cache.read(key)
+            except KeyError:
+                pass
+        version = self.__backend.version(key)  # before the body, a copy changed meanwhile is read again next time
+        if cached_version == str(version):
+            try:
+                body = self.__cache.read(key)
+            except KeyError:
+                pass
+            else:
+                self.__cache.write('.versions/' + key, self.__version_line(version, now))
+                return body
+        body = self.__backend.read(key)
+        self.__cache_copy(key, body, version, now)
+        return body
+
+    def write(self, key, body, content_encoding=None):
+        self.__backend.write(key, body, content_encoding)
+        if key.startswith(self.__prefixes):
+            self.__cache_copy(key, body, self.__backend.version(key), time.time())
+
+    def __cached_version(self, key):
+        """
+        :return: version of the cached copy and the time it was checked, None and 0 if there is no copy
+        """
+        try:
+            line = self.__cache.read('.versions/' + key).decode('utf-8')
+        except KeyError:
+            return None, 0.0
+        version, _, checked = line.partition('\n')
+        return version, float(checked or 0.0)
+
+    @staticmethod
+    def __version_line(version, checked):
+        return '{}\n{}'.format(version, checked)
+
+    def __cache_copy(self, key, body, version, checked):
+        self.__cache.write(key, body)
+        self.__cache.write('.versions/' + key, self.__version_line(version, checked))
+
+    def list(self, prefix):
+        return self.__backend.list(prefix)
+
+    def list_versions(self, prefix):
+        return self.__backend.list_versions(prefix)
+
+    def version(self, key):
+        return self.__backend.version(key)
+
+    def exists(self, key):
+        return self.__backend.exists(key)
+
+
+_default_storage = None
+_default_storage_lock = threading.Lock()
+
+
+def default_storage():
+    """
+    Storage used when none is given, configured with environment variables:
+    HUBIE_STORAGE: 's3' (default), 's3:<bucket>', 'local:<directory>' or 'memory'
+    HUBIE_CACHE_DIR: if set, S3 reads of STAGING_IN files are cached in this directory
+    HUBIE_CACHE_TTL: seconds a cached file is used without checking its version on S3, default 300
+    The same instance is returned on every call, so all readers and writers share one client.
+    """
+    global _default_storage
+    with _default_storage_lock:
+        if _default_storage is None:
+            kind, _, location = os.environ.get('HUBIE_STORAGE', 's3').partition(':')
+            if kind == 'local':
+                storage = LocalStorage(location or '.')
+            elif kind == 'memory':
+                storage = MemoryStorage()
+            elif kind == 's3':
+                storage = S3Storage(bucket_name=location or 'hubie')
+                if os.environ.get('HUBIE_CACHE_DIR'):
+                    storage = CachedStorage(storage, os.environ['HUBIE_CACHE_DIR'],
+                                            ttl=float(os.environ.get('HUBIE_CACHE_TTL', 300)))
+            else:
+                raise ValueError("Unknown HUBIE_STORAGE {}".format(os.environ['HUBIE_STORAGE']))
+            _default_storage = storage
+        return _default_storage
+
+
+def set_default_storage(storage):
+    """
+    Replaces the storage returned by default_storage(), e.g. with a MemoryStorage in benchmarks
+    """
+    global _default_storage
+    with _default_storage_lock:
+        _default_storage = storage
@@ -1,38 +1,117 @@
 from datetime import datetime
+from logic.bundle import bundle_body, bundle_key, default_output, read_bundle, table_lines
+from logic.compression import compress, decompress
 from logic.dictionary import Dictionary
+from logic.instrumentation import add_bytes_read, add_bytes_written, add_rows, profiled, stage
 import json
+import numpy as np
 import pandas as pd
-import boto3
+from logic.snapshot import mark_changed
+from logic.storage import default_storage
 import warnings
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 
+def prefetch_staging_files(list_match_id, storage=None, workers=16):
+    """
+    Fetches the staging files of all matches concurrently over one storage client.
+    A file that fails to be read for another reason than being missing is left out of the prefetched files,
+    Utility reads it again itself, so the error belongs to that match only.
+    :param workers: number of files fetched at the same time
+    :return: dictionary with match id and the prefetched files for Utility, list of match ids with missing staging files
+    """
+    if storage is None:
+        storage = default_storage()
+    path_staging_in = "blno/STAGING_IN/"
+    view_models = ['MatchSummaryViewModel', 'MatchEventsViewModel']
+    keys = [path_staging_in + str(match_id) + "_" + search + ".json" for match_id in list_match_id for search in view_models]
+    errors = {}
+    with stage(None, 'Utility.prefetch_staging_files') as record:
+        files = storage.read_many(keys, workers=workers, errors=errors)
+        record['Rows'] = len(files)
+        record['BytesRead'] = sum(len(body) for body in files.values())
+
+    dict_prefetched = {}
+    list_missing = []
+    for match_id in list_match_id:
+        match_keys = {search: path_staging_in + str(match_id) + "_" + search + ".json" for search in view_models}
+        if any(key not in files and key not in errors for key in match_keys.values()):
+            print("Staging files of match {} are missing".format(match_id))
+            list_missing.append(match_id)
+            continue
+        for key in match_keys.values():
+            if key in errors:
+                print("Reading {} failed: {!r}".format(key, errors[key]))
+        dict_prefetched[match_id] = {search: files[key] for search, key in match_keys.items() if key in files}
+    return dict_prefetched, list_missing
+
+
+def load_batch(list_match_id, dry_run=True, storage=None, workers=16):
+    """
+    Fetches the staging files of all matches concurrently, then builds the Utility of each match from the fetched files
+    :return: dictionary with match id and Utility, list of match ids with missing staging files
+    """
+    if storage is None:
+        storage = default_storage()
+    dict_prefetched, list_missing = prefetch_staging_files(list_match_id, storage=storage, workers=workers)
+    dict_utility = {match_id: Utility(match_id=match_id, dry_run=dry_run, storage=storage, prefetched=prefetched)
+                    for match_id, prefetched in dict_prefetched.items()}
+    return dict_utility, list_missing
+
+
 class Utility:    
-    def __init__(self, match_id=0, dry_run=True):
+    """
+    prefetched: dictionary with the content of the MatchSummaryViewModel and MatchEventsViewModel files,
+                if given the files are not read from storage
+    output: 'folders', 'bundle' or 'both', default_output() if None. With a bundle the saved dataframes are
+            collected and written together by save_bundle
+    """
+    def __init__(self, match_id=0, dry_run=True, storage=None, prefetched=None, output=None):
         
         self.__dic = Dictionary()
         self.__match_id = match_id
         self.__dry_run = dry_run
-        self.__s3 = boto3.resource('s3')
-        self.__bucket_name = "hubie"
+        self.__storage = storage if storage is not None else default_storage()
+        self.__prefetched = prefetched or {}
+        self.__output = output or default_output()
+        self.__bundle_tables = {}
         self.__path_staging_in = "blno/STAGING_IN/"
         self.__path_historical_files = 'blno/HISTORICAL_FILES/'
-        self.__bucket = self.__s3.Bucket(self.__bucket_name)
 
         self.__df_data = pd.DataFrame()
         self.__df_events = pd.DataFrame()
         self.__df_roster = pd.DataFrame()
+        self.__df_box_score_counts = pd.DataFrame()
         self.__df_shooting_stat = pd.DataFrame()
         self.__df_non_shooting_stat = pd.DataFrame()
+        self.__df_lineup_changes = None
+        self.__df_event_lineups = None
 
         if self.__match_id > 0:
+            with profiled(self.__match_id, 'utility'), stage(self.__match_id, 'Utility'):
+                self.__build()
+
+    def __build(self):
+        match_id = self.__match_id
+        with stage(match_id, 'Utility.parse_summary_file'):
             self.__df_summary, self.__home_team, self.__away_team = self.__parse_summary_file()
+        with stage(match_id, 'Utility.parse_events_file') as record:
             self.__df_data = self.__parse_events_file()
+            record['Rows'] = len(self.__df_data['Events'])
+        with stage(match_id, 'Utility.event') as record:
             self.__df_events = self.__event(data=self.__df_data)
+            record['Rows'] = len(self.__df_events)
+        with stage(match_id, 'Utility.roster') as record:
             self.__df_roster = self.__roster(self.__df_data, self.__home_team, self.__away_team)
+            record['Rows'] = len(self.__df_roster)
+        with stage(match_id, 'Utility.box_score_counts') as record:
+            self.__df_box_score_counts = self.__box_score_counts(self.__df_events)
             self.__df_shooting_stat = self.__shooting_stat(self.__df_events)
             self.__df_non_shooting_stat = self.__non_shooting_stat(self.__df_events)
+            record['Rows'] = len(self.__df_box_score_counts)
+        with stage(match_id, 'Utility.players_all_playtimes') as record:
             self.__dict_starters, self.__players_all_playtimes = self.__players_all_playtimes(self.__df_events)
+            record['Rows'] = len(self.__players_all_playtimes)
 
     def __parse_summary_file(self):
         """
@@ -40,8 +119,7 @@ class Utility:
         """
         summary_file = str(self.__match_id) + "_MatchSummaryViewModel.json"
         print("Processing summary file: {}".format(self.__path_staging_in + summary_file))
-        obj = self.__s3.Object(self.__bucket_name, self.__path_staging_in + summary_file)
-        body = obj.get()['Body'].read().decode("utf-8")
+        body = decompress(self.__read_staging_file('MatchSummaryViewModel', summary_file)).decode("utf-8")
         data_summary = json.loads(body)
         now = datetime.now()
         current_time = now.strftime("%Y-%m-%d %H:%M:%S")
@@ -68,6 +146,14 @@ class Utility:
         df = pd.DataFrame(data=match_summary, columns=columns)
         return df, home_team, away_team
 
+    def __read_staging_file(self, view_model, file_name):
+        if view_model in self.__prefetched:
+            body = self.__prefetched.pop(view_model)  # the bytes are not needed after parsing
+        else:
+            body = self.__storage.read(self.__path_staging_in + file_name)
+        add_bytes_read(len(body))
+        return body
+
     def match_header(self):
         folder_name = "match_header"
         print(self.__df_summary[['Match Date', 'HomeTeam', 'AwayTeam']])
@@ -79,8 +165,7 @@ class Utility:
         """
         events_file = str(self.__match_id) + "_MatchEventsViewModel.json"
         print("Processing events file: {}".format(self.__path_staging_in + events_file))
-        obj = self.__s3.Object(self.__bucket_name, self.__path_staging_in + events_file)
-        body = obj.get()['Body'].read().decode("utf-8")
+        body = decompress(self.__read_staging_file('MatchEventsViewModel', events_file)).decode("utf-8")
         data = json.loads(body)
 
         '''self.events = self.__event()
@@ -114,31 +199,36 @@ class Utility:
 
     def __event(self, data):
         """
+        Return: DataFrame with one row per event. The game clock is kept as integers:
+        Period (1-4, overtimes 5 and up), GameSecond (seconds since tip-off) and MinuteRound (minute the event belongs to)
         """
-        events = pd.DataFrame(data['Events']).fillna(0) # text replacement
-        events = events.loc[events.PeriodTime != ''] # remove rows with no time
+        # only the columns the analyses use
+        columns = ['MatchEventType', 'PeriodName', 'PeriodTime', 'Team', 'Player', 'PlayerIn', 'PlayerOut', 'Assist',
+                   'ShotResult', 'FoulType']
+        events = pd.DataFrame(data['Events'], columns=columns)
+        events = events.loc[events.PeriodTime.notnull() & (events.PeriodTime != '')] # remove rows with no time
         events['Team'] = events['Team'].replace({'B': 'Away', 'H': 'Home'}) #change norwegian B (Borte) with english A (Away)
 
-        # type conversion
+        # type conversion: ids and codes need 32 bits, the text columns have few distinct values
         convert_cols = ['Assist', 'Player', 'PlayerIn', 'PlayerOut', 'ShotResult', 'FoulType']
-        events[convert_cols] = events[convert_cols].apply(lambda x: x.astype('int32'))
+        events[convert_cols] = events[convert_cols].fillna(0).astype('int32')
+        category_cols = ['MatchEventType', 'PeriodName', 'Team']
+        events[category_cols] = events[category_cols].astype('category')
 
-        #format PeriodTime column
-        events['PeriodTime'] = pd.to_datetime(events.PeriodTime, format='%M:%S')
         events = events.rename(columns={'Team': 'HomeAway'})
-        # Creates column Minute which hold time values from 00:00:00 to 00:50:00
-        dict_period_to_minute = {'1. periode': 0, '2. periode': 10, '3. periode': 20, '4. periode': 30,
-                                 '1. ekstraomgang': 40, '2. ekstraomgang': 45, '3. ekstraomgang': 50}
-
-        events['Minute'] = events.PeriodName.replace(dict_period_to_minute)
-        events['Minute'] = pd.to_timedelta(events.Minute, unit='m')
-        events['Minute'] = events['Minute'] + events['PeriodTime']
+        # Period holds 1-4 for the regular periods and 5, 6, ... for the overtimes
+        period = events.PeriodName.str.extract(r'^(\d+)\. (periode|ekstraomgang)$')
+        events['Period'] = (period[0].astype('int8') + (period[1] == 'ekstraomgang').astype('int8') * 4).astype('int8')
+        # GameSecond holds the seconds since tip-off, PeriodTime (MM:SS) is the time since the start of the period
+        period_time = events.PeriodTime.str.split(':', n=1, expand=True).astype('int16')
+        events['GameSecond'] = (self.__period_start_second(events.Period.astype('int16')) + period_time[0] * 60 +
+                                period_time[1]).astype('int16')
 
         # Round up to a full minute for aggregation
-        events['MinuteRound'] = events.Minute.dt.ceil(freq="min")
+        events['MinuteRound'] = ((events.GameSecond + 59) // 60).astype('int16')
 
         # Some play-by-play datasets begin with MatchEventType = Substitution. Those rows are removed here
-        filter_sub_first = (events.MatchEventType == 'Substitution') & (events.Minute == pd.to_datetime('1900-01-01 00:00:00'))
+        filter_sub_first = (events.MatchEventType == 'Substitution') & (events.GameSecond == 0)
         no_top_sub_rows = len(events.loc[filter_sub_first])
         events = events[no_top_sub_rows:]
         events.index = range(len(events))
@@ -147,150 +237,190 @@ class Utility:
 
     def __players_all_playtimes(self, events):
         """
-        Method calculates each player's time on the floor - every time interval the player is on the floor
-        Return: DataFrame with following columns: HomeAway Player In Out PlayTime
+        Method calculates each player's time on the floor - every time interval the player is on the floor.
+        The substitutions are sorted once and all players' intervals are derived from them together.
+        A player who was never substituted played the whole game if the player has any event, otherwise not at all.
+        The game ends at the end of the last period played, overtimes included.
+        Return: dictionary with 'Y'/'N' for starters, DataFrame with following columns: MatchId Player In Out PlayTime,
+        In and Out are seconds since tip-off
         """
-
         dict_players = self.dict_player_fullname()
-        #dict_player_team = self.dict_player_team()
-
-        #cols = ['PlayerIn', 'PlayerOut', 'Minute']
-        df_subs = events.loc[events.MatchEventType == 'Substitution']
-
-        first_second = [pd.to_datetime('1900-01-01 00:00:00')]
-        last_second = [pd.to_datetime('1900-01-01 00:40:00')]
-        playing_time = []
-        dict_starters = {}
-
-        for player_id, name in dict_players.items():
-            in_out = []
-            list_minutes = []
-            list_playing_time = []
-            f_sub = (df_subs.PlayerIn == player_id) | (df_subs.PlayerOut == player_id)
-            df_subs_player = df_subs.loc[f_sub].reset_index(drop=True)
-
-            if not df_subs_player.empty:  # only players that were substituted.
-                for idx in range(len(df_subs_player)):
-                    row = df_subs_player.iloc[idx]
-                    list_minutes.append(row['Minute'])
-                    if row['PlayerIn'] == player_id:
-                        in_out.append('in')
-                    if row['PlayerOut'] == player_id:
-                        in_out.append('out')
-
-                # if starter add first_second at the beginning
-                if in_out[0] == 'out':
-                    in_out = ['in'] + in_out
-                    list_minutes = first_second + list_minutes
-                    dict_starters[player_id] = 'Y'
-                else:
-                    dict_starters[player_id] = 'N'
-
-                # if finished game add last_second at the end
-                if in_out[-1] == 'in':
-                    in_out = in_out + ['out']
-                    list_minutes = list_minutes + last_second
-
-                for idx in range(len(in_out) - 1, 0, -2):  # go backwards and loop only through 'out' values
-                    delta_time = list_minutes[idx] - list_minutes[idx - 1]
-                    list_playing_time.append(delta_time)
-                    playing_time.append(
-                        {'player_id': player_id, 'in': list_minutes[idx-1], 'out': list_minutes[idx]})
-
-        list_players_in_sub = df_subs.PlayerIn.tolist() + df_subs.PlayerOut.tolist() # all players in substitution
-        all_players = dict_players.keys() # all players
-        not_in_sub = all_players - list_players_in_sub  # players not in substitution column
-
-        for player_id in not_in_sub:
-            _count = events['Player'].loc[events.Player.isin([player_id])].count()
-            if _count > 0:  # player played all game
-                playing_time.append({'player_id': player_id, 'in': pd.to_datetime(first_second[0]), 'out': pd.to_datetime(last_second[0])})
-                dict_starters[player_id] = 'Y'
-            else:  # player didnt play
-                playing_time.append({'player_id': player_id, 'in': pd.to_datetime(first_second[0]), 'out': pd.to_datetime(first_second[0])})
-                dict_starters[player_id] = 'N'
-
-        df_play_time = pd.DataFrame.from_records(playing_time)
-        df_play_time.columns = ['In', 'Out', 'Player']
-        df_play_time['PlayTime'] = df_play_time.Out - df_play_time.In
+        list_players = list(dict_players.keys())
+
+        first_second = 0
+        last_second = self.__game_length_seconds(events)
+
+        df_subs = events.loc[events.MatchEventType == 'Substitution', ['PlayerIn', 'PlayerOut', 'GameSecond']]
+        df_subs = df_subs.rename(columns={'GameSecond': 'Second'})
+        df_subs = df_subs.assign(Order=range(len(df_subs)))
+        # one row per player per substitution, a player coming in and out in the same row goes in first
+        moves = pd.concat([df_subs[['PlayerIn', 'Second', 'Order']].rename(columns={'PlayerIn': 'Player'}).assign(Out=0),
+                           df_subs[['PlayerOut', 'Second', 'Order']].rename(columns={'PlayerOut': 'Player'}).assign(Out=1)],
+                          ignore_index=True)
+        moves = moves.loc[moves.Player.isin(list_players)].sort_values(['Player', 'Order', 'Out'], kind='stable')
+
+        grouped = moves.groupby('Player', sort=False).Out
+        first_move = grouped.first()
+        last_move = grouped.last()
+        # starters were on the floor from the beginning: the first substitution takes them out
+        starters = first_move.index[first_move == 1]
+        # players on the floor at the end of the game: the last substitution brings them in
+        finishers = last_move.index[last_move == 0]
+        moves = pd.concat([pd.DataFrame({'Player': starters, 'Second': first_second, 'Order': -1, 'Out': 0}),
+                           moves,
+                           pd.DataFrame({'Player': finishers, 'Second': last_second, 'Order': len(df_subs), 'Out': 1})],
+                          ignore_index=True).sort_values(['Player', 'Order', 'Out'], kind='stable')
+
+        # pair every second move, counted from the last one, with the move before it
+        moves['In'] = moves.groupby('Player', sort=False).Second.shift(1)
+        from_last = moves.groupby('Player', sort=False).cumcount(ascending=False)
+        df_intervals = moves.loc[(from_last % 2 == 0) & moves.In.notnull(), ['Player', 'In', 'Second']] \
+            .rename(columns={'Second': 'Out'})
+
+        # players that were never substituted
+        substituted = set(first_move.index)
+        not_in_sub = [player_id for player_id in list_players if player_id not in substituted]
+        played = set(events.Player.unique())
+        played_all_game = [player_id for player_id in not_in_sub if player_id in played]
+        df_not_in_sub = pd.DataFrame({'Player': not_in_sub,
+                                      'In': first_second,
+                                      'Out': [last_second if player_id in played else first_second
+                                              for player_id in not_in_sub]})
+
+        dict_starters = {player_id: 'N' for player_id in list_players}
+        dict_starters.update({player_id: 'Y' for player_id in list(starters) + played_all_game})
+
+        df_play_time = pd.concat([df_intervals, df_not_in_sub], ignore_index=True)
+        df_play_time['Player'] = df_play_time.Player.astype('int64')
+        df_play_time['In'] = df_play_time.In.astype('int32')
+        df_play_time['Out'] = df_play_time.Out.astype('int32')
+        df_play_time['PlayTime'] = pd.to_timedelta(df_play_time.Out - df_play_time.In, unit='s')
         df_play_time['MatchId'] = self.__match_id
         df_play_time = df_play_time[['MatchId', 'Player', 'In', 'Out', 'PlayTime']]
         return dict_starters, df_play_time
 
-    def __event_lineups(self):
+    def __period_start_second(self, period):
         """
-        Calculates the lineups for home and away teams at each registered event
+        Regular periods are 10 minutes and overtimes 5 minutes
+        :param period: period number, or Series of period numbers, 1-4 regular periods and 5 and up overtimes
+        Return: seconds from tip-off to the start of the period
         """
-        
-        list_events_minutes = self.events.Minute.loc[self.events.MatchEventType != 'Substitution'].unique()
-        list_lineups_at_event = []
-        playtime_df = self.players_all_playtimes
-        for t in list_events_minutes:
-            f = (playtime_df.In < t) & \
-                (playtime_df.Out >= t)
-
-            home_list = playtime_df['Player'].loc[f & (playtime_df.HomeAway == 'Home')].tolist()
-            away_list = playtime_df['Player'].loc[f & (playtime_df.HomeAway == 'Away')].tolist()
-
-            dict_home_lineup = {"Minute": pd.to_datetime(t), "Lineup": home_list, "HomeAway": "Home"}
-            dict_away_lineup = {"Minute": pd.to_datetime(t), "Lineup": away_list, "HomeAway": "Away"}
-
-            list_lineups_at_event.append(dict_home_lineup)
-            list_lineups_at_event.append(dict_away_lineup)
-
-            list_events_players = []
-            for line in list_lineups_at_event:
-                for player_id in line['Lineup']:
-                    row = {'Minute': line['Minute'], 'Player': player_id, 'HomeAway': line['HomeAway']}
-                    list_events_players.append(row)
-
-        event_lineups_df = pd.DataFrame.from_records(list_events_players)
-        event_lineups_df['MatchId'] = self.__match_id
-        return event_lineups_df
-    
-    def event_lineups_oneline(self):
+        return (period.clip(upper=5) - 1) * 600 + (period - 5).clip(lower=0) * 300
+
+    def __game_length_seconds(self, events):
         """
-        Return DataFrame with one line per event per Home/Away team with a Minute of one event and a comma separated string with 5 PlayerIds
+        Return: seconds from tip-off to the end of the last period in the events, 2400 for a game without overtime
         """
-        distinct_minute = self.event_lineups.Minute.unique() # Minute of every event
-        list_all_rows = [] # temp list
-        for minute in distinct_minute: 
-            for ha in self.dict_team_names().keys(): # iterate for Home and Away
-                f_homeaway = (self.event_lineups.HomeAway == ha) & (self.event_lineups.Minute == minute)
-                str_event_lineup = ','.join(str(e) for e in list(self.event_lineups.Player.loc[f_homeaway])) 
+        last_period = pd.Series([max(events.Period.max() if len(events) else 4, 4)])
+        return int(self.__period_start_second(last_period + 1)[0])
 
-                row = {"Minute": pd.to_datetime(minute), "Lineup": str_event_lineup, "HomeAway": ha}
-                list_all_rows.append(row)
-        df_lineup_event = pd.DataFrame.from_records(list_all_rows)
+    def __lineup_changes(self, events):
+        """
+        Calculates the lineups for home and away teams from tip-off and after every substitution.
+        The substitutions are swept once: the players on the floor for each team start with the starters
+        and change only at substitutions. Event lineups and lineup stints are both made from these rows.
+        Return: DataFrame with one row for tip-off (Event -1) and one per substitution with following columns:
+        MatchId Event GameSecond HomeLineup AwayLineup, the lineups from that event on, tuples of sorted player ids
+        """
+        dict_home_away = {'H': 'Home', 'A': 'Away'}
+        dict_player_home_away = dict(zip(self.__df_roster.Id, self.__df_roster.HomeAway.map(dict_home_away)))
+        on_floor = {'Home': set(), 'Away': set()}
+        for player_id, starter in self.__dict_starters.items():
+            if starter == 'Y':
+                on_floor[dict_player_home_away[player_id]].add(player_id)
+        lineup = {ha: tuple(sorted(players)) for ha, players in on_floor.items()}
+
+        subs = events.loc[events.MatchEventType == 'Substitution']
+        list_event = [-1]
+        list_second = [0]
+        list_home_lineup = [lineup['Home']]
+        list_away_lineup = [lineup['Away']]
+        for idx, second, ha, player_in, player_out in zip(subs.index, subs.GameSecond, subs.HomeAway, subs.PlayerIn,
+                                                          subs.PlayerOut):
+            on_floor[ha].discard(player_out)
+            if player_in != 0:
+                on_floor[ha].add(player_in)
+            lineup[ha] = tuple(sorted(on_floor[ha]))  # tuples are shared by all events until the next substitution
+            list_event.append(idx)
+            list_second.append(second)
+            list_home_lineup.append(lineup['Home'])
+            list_away_lineup.append(lineup['Away'])
+
+        lineup_changes_df = pd.DataFrame({'Event': list_event,
+                                          'GameSecond': list_second,
+                                          'HomeLineup': list_home_lineup,
+                                          'AwayLineup': list_away_lineup})
+        lineup_changes_df.insert(0, 'MatchId', self.__match_id)
+        return lineup_changes_df
+
+    def __event_lineups(self, events):
+        """
+        Calculates the lineups for home and away teams at each registered event: the lineups of the last
+        substitution before the event, in the order of the events.
+        Return: DataFrame with one row per event (substitutions excluded) with following columns:
+        MatchId Event GameSecond HomeLineup AwayLineup, where a lineup is a tuple of sorted player ids
+        """
+        changes = self.__lineup_changes(events)
+        not_sub = events.loc[events.MatchEventType != 'Substitution']
+        position = np.searchsorted(changes.Event.to_numpy(), not_sub.index.to_numpy(), side='right') - 1
+
+        event_lineups_df = pd.DataFrame({'Event': not_sub.index,
+                                         'GameSecond': not_sub.GameSecond.values,
+                                         'HomeLineup': changes.HomeLineup.to_numpy()[position],
+                                         'AwayLineup': changes.AwayLineup.to_numpy()[position]})
+        event_lineups_df.insert(0, 'MatchId', self.__match_id)
+        return event_lineups_df
 
-        return df_lineup_event
+    def event_lineups_oneline(self):
+        """
+        Return DataFrame with one line per event per Home/Away team with a GameSecond of one event and a comma separated string with 5 PlayerIds
+        """
+        df = self.get_event_lineups()
+        list_team_rows = []
+        for ha in self.get_team_names().keys(): # Home and Away
+            team_rows = pd.DataFrame({'Event': df.Event,
+                                      'GameSecond': df.GameSecond,
+                                      'Lineup': df[ha + 'Lineup'].map(lambda players: ','.join(str(e) for e in players)),
+                                      'HomeAway': ha})
+            list_team_rows.append(team_rows)
+        df_lineup_event = pd.concat(list_team_rows).sort_values('Event', kind='stable')
+
+        return df_lineup_event[['GameSecond', 'Lineup', 'HomeAway']].reset_index(drop=True)
+
+    def __box_score_counts(self, events):
+        """
+        Counts every box score category for all players in one pass over the events:
+        made/missed 1P, 2P and 3P, rebounds, turnovers, steals, blocks, assists and fouls.
+        Return: DataFrame with one row per roster player (index Player) and one column per category
+        """
+        columns = list(self.__dic.shot_stat_column.values()) + self.__dic.non_shooting_event_types
+        is_shot = events.MatchEventType == 'Shot'
+        stat = events.MatchEventType.astype(object).where(~is_shot, events.ShotResult.map(self.__dic.shot_stat_column))
+        stat = stat.where(stat.isin(columns))
+        # assists and fouls are stored in separate columns, they are counted as extra rows
+        f_assist = events.Assist != 0
+        f_foul = events.FoulType != 0
+        df = pd.DataFrame({'Player': pd.concat([events.Player, events.Assist[f_assist], events.Player[f_foul]],
+                                               ignore_index=True),
+                           'Stat': pd.concat([stat,
+                                              pd.Series('Assist', index=events.index[f_assist]),
+                                              pd.Series('Foul', index=events.index[f_foul])],
+                                             ignore_index=True)})
+
+        columns = columns + ['Assist', 'Foul']
+        counts = df.groupby(['Player', 'Stat']).size().unstack(fill_value=0)
+        counts = counts.reindex(index=list(self.dict_player_fullname().keys()), columns=columns, fill_value=0)
+        counts.index.name = 'Player'
+        counts.columns.name = None
+        return counts.astype('int64')
 
     def __shooting_stat(self, events):
         """
         """
-        df = events[['Player', 'ShotResult', 'MatchEventType']]
-        f = (df.MatchEventType == 'Shot')
-        df = df.loc[f][['ShotResult', 'Player']]
-        
-        list_all_rows = []
-        for player_id in self.dict_player_fullname().keys(): #loop through all players 
-            for shot in self.__dic.shot_description: #loop through all shot types
-                f = (df.ShotResult == shot) & (df.Player == player_id)
-                try: # if no attempt made, value with index 1 is null
-                    count_shot = f.value_counts()[1]
-                except KeyError:
-                    count_shot = 0
-                if shot == 200443: made2 = count_shot
-                if shot == 200581: missed2 = count_shot
-                if shot == 200444: made1 = count_shot
-                if shot == 200445: missed1 = count_shot
-                if shot == 200442: made3 = count_shot
-                if shot == 200580: missed3 = count_shot
-            row = [player_id, made2, missed2, made1, missed1, made3, missed3]
-            list_all_rows.append(row)
-        shot_df = pd.DataFrame.from_records(list_all_rows, columns=["Player", "Made2", "Missed2", "Made1", "Missed1", "Made3", "Missed3"])
-        shot_df['PlayerName'] = shot_df.Player.replace(self.dict_player_fullname())
-        shot_df['Team'] = shot_df.Player.replace(self.dict_player_team())
+        columns = ["Made2", "Missed2", "Made1", "Missed1", "Made3", "Missed3"]
+        shot_df = self.__df_box_score_counts[columns].reset_index()
+        shot_df['PlayerName'] = shot_df.Player.map(self.dict_player_fullname())
+        shot_df['Team'] = shot_df.Player.map(self.dict_player_team())
         shot_df['MatchId'] = self.__match_id
         return shot_df
 
@@ -300,20 +430,7 @@ class Utility:
         
         Because assists are stored in separate column in the source files, this method is needed.
         """
-        df = events
-        f_assist = (df.Assist != 0)
-        df = df[['Player', 'Assist']].loc[f_assist].groupby('Assist').count().reset_index()
-        list_assist = []
-        for player_id in self.dict_player_fullname().keys():
-            no_assists = 0
-            f = (df.Assist == player_id)
-            if (f.sum() == 1):
-                no_assists = (list(df.loc[f]['Player'])[0])
-                
-            assist = [player_id, no_assists]
-            list_assist.append(assist)
-
-        assist_df = pd.DataFrame.from_records(list_assist, columns=['Player', 'Assist'])
+        assist_df = self.__df_box_score_counts[['Assist']].reset_index()
         return assist_df
 
     def __foul_stat(self):
@@ -321,52 +438,16 @@ class Utility:
         Return DataFrame with Player Id and sum of all fouls
         Because fouls are stored in separate column in the source files, this method is needed.
         """
-        df = self.__df_events
-        f_foul = (df.FoulType != 0)
-        df = df[['Player', 'FoulType']].loc[f_foul].groupby('Player').count().reset_index()
-
-        list_foul = []
-        for player_id in self.dict_player_fullname().keys():
-            no_fouls = 0
-            f = (df.Player == player_id)
-            if f.sum() == 1:
-                no_fouls = (list(df.loc[f]['FoulType'])[0])
-                
-            foul = [player_id, no_fouls]
-            list_foul.append(foul)
-
-        foul_df = pd.DataFrame.from_records(list_foul, columns=['Player', 'Foul'])
+        foul_df = self.__df_box_score_counts[['Foul']].reset_index()
         return foul_df
 
     def __non_shooting_stat(self, events):
         """
         """
-        df = events
-        event_type = ['DefensiveRebound', 'OffensiveRebound', 'Turnover', 'Steal', 'Block']
-        f = (df.MatchEventType.isin(event_type))
-        columns = ['Player', 'MatchEventType', 'HomeAway', 'PeriodTime']
-        df = df[columns].loc[f]
-
-        list_all_rows = []
-        for player_id in self.dict_player_fullname().keys():
-            for event in event_type:        
-                f = (df.MatchEventType == event) & (df.Player == player_id)
-                try: # if no stat for this event, value with index 1 is null
-                    count_event = f.value_counts()[1]
-                except KeyError:
-                    count_event = 0
-
-                if event == 'DefensiveRebound': def_reb = count_event
-                if event == 'OffensiveRebound': off_reb = count_event
-                if event == 'Turnover': turnover = count_event
-                if event == 'Steal': steal = count_event
-                if event == 'Block': block = count_event
-
-            row = [player_id, def_reb, off_reb, turnover, steal, block]
-            list_all_rows.append(row)
-        non_shot_df = pd.DataFrame.from_records(list_all_rows, columns= ['Player'] + event_type) # columns are all event types
-        non_shot_df['PlayerName'] = non_shot_df.Player.replace(self.dict_player_fullname())
-        non_shot_df['Team'] = non_shot_df.Player.replace(self.dict_player_team())
+        event_type = self.__dic.non_shooting_event_types
+        non_shot_df = self.__df_box_score_counts[event_type].reset_index() # columns are all event types
+        non_shot_df['PlayerName'] = non_shot_df.Player.map(self.dict_player_fullname())
+        non_shot_df['Team'] = non_shot_df.Player.map(self.dict_player_team())
         non_shot_df['MatchId'] = self.__match_id
         
         all_non_shot_stat_df = pd.DataFrame.merge(non_shot_df, self.__assist_stat(events)) # join to get assists data
@@ -400,6 +481,28 @@ class Utility:
     def get_all_playtimes(self):
         return self.__players_all_playtimes
 
+    def get_game_length(self):
+        """
+        :return: seconds from tip-off to the end of the game, overtimes included
+        """
+        return self.__game_length_seconds(self.__df_events)
+
+    def get_lineup_changes(self):
+        """
+        Lineups from tip-off and after every substitution, calculated on first use
+        """
+        if self.__df_lineup_changes is None:
+            self.__df_lineup_changes = self.__lineup_changes(self.__df_events)
+        return self.__df_lineup_changes
+
+    def get_event_lineups(self):
+        """
+        Lineups are calculated on first use, they are not needed for the standard analyses
+        """
+        if self.__df_event_lineups is None:
+            self.__df_event_lineups = self.__event_lineups(self.__df_events)
+        return self.__df_event_lineups
+
     def get_team_names(self):
         return {"Home": self.__home_team, "Away": self.__away_team}
 
@@ -433,25 +536,68 @@ class Utility:
         return dict_player_team
 
 ######
-# Save to S3
+# Save to storage
 ######
 
     def save_dataframe(self, df, folder_name):
+        add_rows(len(df))
+        if self.__output != 'folders':
+            self.__bundle_tables[folder_name] = df
+            if self.__output == 'bundle':
+                return
         if self.__dry_run != True:
-            self.__save_dataframe_s3(df=df, folder=folder_name)
+            with stage(self.__match_id, 'save.' + folder_name) as record:
+                self.__save_dataframe_storage(df=df, folder=folder_name)
+                record['Rows'] = len(df)
             print("Dataframe saved to folder {}.".format(folder_name))
         else:
             print("Dry run is activated: dataframe {} was created but not saved!".format(folder_name))
 
-    def __save_dataframe_s3(self, df, folder):
+    def __save_dataframe_storage(self, df, folder):
         competition = 'blno/' + folder + '/'
-        s3_resource = boto3.resource('s3')
-        bucket_name = 'hubie'
-        json_data = df.to_json(force_ascii=False, date_format='iso', orient='records', lines=True)
+        json_data = table_lines(df)
 
-        s3object = s3_resource.Object(bucket_name, competition + str(self.__match_id) + '.json')
+        body, content_encoding = compress(json_data.encode('UTF-8'))
+        self.__storage.write(competition + str(self.__match_id) + '.json', body, content_encoding)
+        add_bytes_written(len(body))
 
-        s3object.put(
-            Body=(bytes(json_data.encode('UTF-8')))
-        )
+    def save_bundle(self, replace=False):
+        """
+        Writes all dataframes saved since the last call to the bundle of the match, blno/match_bundle/<match id>.json.
+        The other tables of an existing bundle are kept
+        :param replace: if True, the bundle has only the dataframes saved since the last call, the existing
+                        bundle is not read; for run_all_analyses, which saves all tables
+        """
+        tables, self.__bundle_tables = self.__bundle_tables, {}
+        if not tables:
+            return
+        if self.__dry_run:
+            print("Dry run is activated: bundle with {} was created but not saved!".format(", ".join(tables)))
+            return
+        with stage(self.__match_id, 'save.match_bundle') as record:
+            tables_lines = {} if replace else self.__read_bundle_tables()
+            tables_lines.update((name, table_lines(df)) for name, df in tables.items())
+            body, content_encoding = compress(bundle_body(self.__match_id, tables_lines))
+            self.__storage.write(bundle_key(self.__match_id), body, content_encoding)
+            add_bytes_written(len(body))
+            record['Rows'] = sum(len(df) for df in tables.values())
+        print("Bundle saved with {}.".format(", ".join(tables)))
+
+    def mark_changed(self):
+        """
+        Writes the change marker the web app polls, after the tables of the match were saved
+        """
+        if self.__dry_run:
+            return
+        mark_changed([self.__match_id], self.__storage)
 
+    def __read_bundle_tables(self):
+        """
+        :return: dictionary with table name and json lines text of the existing bundle, empty if there is none
+        """
+        try:
+            body = self.__storage.read(bundle_key(self.__match_id))
+        except KeyError:
+            return {}
+        add_bytes_read(len(body))
+        return read_bundle(body)
@@ -0,0 +1,124 @@
+"""
+A small hand-made match in the shape of the MatchSummaryViewModel and MatchEventsViewModel files,
+with outputs that can be worked out by hand, for the tests of the analyses.
+
+Home 'H' has the players 101-107, Away 'B' 201-207, the first five of each team start.
+Score by period: 5:5, 2:0, 1:2, 2:1 (10:8); with overtime 5:5, 2:0, 1:2, 0:1, 2:0 (10:8 after one overtime).
+"""
+import json
+from logic.analysis import Analysis
+from logic.snapshot import read_json_files
+from logic.storage import MemoryStorage
+
+PERIOD_NAMES = {1: '1. periode', 2: '2. periode', 3: '3. periode', 4: '4. periode', 5: '1. ekstraomgang',
+                6: '2. ekstraomgang'}
+MADE = {1: 200444, 2: 200443, 3: 200442}
+MISSED = {1: 200445, 2: 200581, 3: 200580}
+FOUL_TYPE = 200448
+
+
+def event(event_type, period, period_time, team, **values):
+    row = {'MatchEventType': event_type, 'PeriodName': PERIOD_NAMES[period], 'PeriodTime': period_time, 'Team': team,
+           'Player': None, 'PlayerIn': None, 'PlayerOut': None, 'Assist': None, 'ShotResult': None, 'FoulType': None,
+           'Description': ''}
+    row.update(values)
+    return row
+
+
+def shot(period, period_time, team, player, points, made=True, assist=None):
+    return event('Shot', period, period_time, team, Player=player,
+                 ShotResult=(MADE if made else MISSED)[points], Assist=assist)
+
+
+def foul(period, period_time, team, player):
+    return event('Foul', period, period_time, team, Player=player, FoulType=FOUL_TYPE)
+
+
+def substitution(period, period_time, team, player_in, player_out):
+    return event('Substitution', period, period_time, team, PlayerIn=player_in, PlayerOut=player_out)
+
+
+def players(team, first_id):
+    return [{'Id': first_id + i, 'FirstName': 'Player', 'LastName': str(first_id + i), 'ShirtNo': str(4 + i),
+             'IsCaptain': i == 0, 'IsCoach': False} for i in range(7)] + \
+           [{'Id': first_id + 9, 'FirstName': 'Coach', 'LastName': team, 'ShirtNo': None, 'IsCaptain': False,
+             'IsCoach': True}]
+
+
+def fixture_match(overtime=False, league='Test League'):
+    """
+    :return: summary and events view models as dictionaries
+    """
+    events = [
+        substitution(1, '00:00', 'H', 101, 101),  # some files start with substitutions at 00:00
+        shot(1, '00:30', 'H', 101, 2, assist=102),
+        shot(1, '01:00', 'B', 201, 3),
+        foul(1, '02:00', 'H', 103),
+        foul(1, '02:30', 'H', 104),
+        foul(1, '03:00', 'H', 101),
+        foul(1, '04:10', 'H', 102),
+        foul(1, '05:00', 'H', 105),
+        substitution(1, '05:00', 'H', 106, 101),
+        shot(1, '05:00', 'B', 202, 1),
+        shot(1, '05:00', 'B', 202, 1),
+        shot(1, '07:00', 'H', 106, 2, made=False),
+        event('DefensiveRebound', 1, '07:00', 'B', Player=203),
+        shot(1, '08:00', 'H', 106, 3, assist=103),
+        substitution(2, '03:00', 'B', 206, 205),
+        shot(2, '05:00', 'H', 102, 2),
+        event('Turnover', 2, '06:00', 'B', Player=201),
+        event('Steal', 2, '06:00', 'H', Player=104),
+        shot(3, '02:00', 'B', 206, 2),
+        substitution(3, '04:00', 'H', 101, 106),
+        shot(3, '06:00', 'H', 101, 1),
+        foul(4, '01:00', 'B', 201),
+        foul(4, '02:00', 'B', 202),
+        foul(4, '03:00', 'B', 203),
+        foul(4, '04:00', 'B', 204),
+        foul(4, '05:00', 'H', 103),
+        foul(4, '06:00', 'H', 104),
+        shot(4, '07:00', 'B', 203, 1),
+    ]
+    periods = [{'HomeGoals': 5, 'AwayGoals': 5}, {'HomeGoals': 2, 'AwayGoals': 0}, {'HomeGoals': 1, 'AwayGoals': 2}]
+    if overtime:
+        events += [
+            foul(5, '01:00', 'H', 102),
+            foul(5, '02:00', 'H', 105),
+            foul(5, '03:00', 'B', 206),
+            shot(5, '04:00', 'H', 105, 2),
+        ]
+        periods += [{'HomeGoals': 0, 'AwayGoals': 1}, {'HomeGoals': 2, 'AwayGoals': 0}]
+    else:
+        events.append(shot(4, '09:00', 'H', 105, 2))
+        periods.append({'HomeGoals': 2, 'AwayGoals': 1})
+
+    summary = {'Tournament': league, 'HomeTeam': 'Home', 'AwayTeam': 'Away', 'HomeGoals': 10, 'AwayGoals': 8,
+               'Date': '2020-02-01T18:00:00', 'Periods': periods}
+    data = {'Events': events, 'HomePlayers': players('Home', 101), 'AwayPlayers': players('Away', 201)}
+    return summary, data
+
+
+def write_match(storage, match_id, summary, data):
+    storage.write('blno/STAGING_IN/{}_MatchSummaryViewModel.json'.format(match_id), json.dumps(summary))
+    storage.write('blno/STAGING_IN/{}_MatchEventsViewModel.json'.format(match_id), json.dumps(data))
+
+
+def analysed_match(match_id=1, storage=None, **kwargs):
+    """
+    Writes the fixture match to storage and runs all analyses on it
+    :param kwargs: arguments of fixture_match
+    :return: Analysis of the match and the storage the results are saved in
+    """
+    if storage is None:
+        storage = MemoryStorage()
+    write_match(storage, match_id, *fixture_match(**kwargs))
+    analysis = Analysis(match_id, dry_run=False, storage=storage, output='folders')
+    analysis.run_all_analyses()
+    return analysis, storage
+
+
+def read_table(storage, folder, match_id=1):
+    """
+    :return: dataframe of the file a match saved to a folder
+    """
+    return read_json_files(['blno/{}/{}.json'.format(folder, match_id)], storage)
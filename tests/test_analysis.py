@@ -0,0 +1,147 @@
+import contextlib
+import io
+import unittest
+from benchmarks.synthetic import PROFILES, match
+from logic.analysis import Analysis
+from logic.storage import MemoryStorage
+from match_fixture import analysed_match, read_table, write_match
+
+PERIOD_END_SECONDS = [600, 1200, 1800, 2400, 2700, 3000]
+
+
+def quiet(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def period_scores(analysis):
+    """
+    :return: points of Home and Away in every period played, from the cumulative score by second
+    """
+    score = analysis.cumulative_score('second').set_index('GameSecond')
+    game_length = score.index.max()
+    ends = [second for second in PERIOD_END_SECONDS if second <= game_length]
+    at_end = score.loc[ends, ['Home', 'Away']]
+    return (at_end - at_end.shift(fill_value=0)).astype(int).values.tolist()
+
+
+def synthetic_matches():
+    """
+    :return: summary, events and the Analysis of a generated match of every profile
+    """
+    storage = MemoryStorage()
+    for match_id, profile in enumerate(PROFILES, start=1):
+        summary, data = match(match_id, seed=3, **PROFILES[profile])
+        write_match(storage, match_id, summary, data)
+        yield profile, summary, quiet(Analysis, match_id, dry_run=True, storage=storage)
+
+
+class TestScores(unittest.TestCase):
+
+    def test_period_scores_equal_summary(self):
+        for overtime in [False, True]:
+            with self.subTest(overtime=overtime):
+                analysis, storage = quiet(analysed_match, overtime=overtime)
+                header = read_table(storage, 'match_header').iloc[0]
+                expected = [list(score) for score in zip(header['Period Score Home'], header['Period Score Away'])]
+                self.assertEqual(period_scores(analysis), expected)
+                self.assertEqual([header['Score Home'], header['Score Away']], [10, 8])
+
+    def test_period_scores_of_synthetic_matches(self):
+        for profile, summary, analysis in synthetic_matches():
+            with self.subTest(profile=profile):
+                expected = [[period['HomeGoals'], period['AwayGoals']] for period in summary['Periods']]
+                self.assertEqual(period_scores(analysis), expected)
+
+    def test_cumulative_score_by_minute(self):
+        analysis, storage = quiet(analysed_match, overtime=True)
+        df = read_table(storage, 'cumulative_score')
+        self.assertEqual(df.Minute.tolist(), list(range(46)))
+        self.assertEqual(df.iloc[-1][['Home', 'Away', 'Difference']].tolist(), [10, 8, 2])
+        self.assertEqual(df.loc[df.Minute == 1, ['Home', 'Away']].values.tolist(), [[2, 3]])
+        event_rows = analysis.cumulative_score('event')
+        self.assertEqual(len(event_rows), 11)  # tip-off and ten made shots
+        self.assertTrue(event_rows.GameSecond.is_monotonic_increasing)
+
+
+
+class TestPlayTime(unittest.TestCase):
+
+    def team_seconds(self, analysis):
+        quiet(analysis.player_statistic)
+        df = analysis.get_player_stat()
+        return (df.groupby('HomeAway').MIN.sum().dt.total_seconds().astype(int)).to_dict()
+
+    def test_five_players_all_game(self):
+        for overtime, game_length in [(False, 2400), (True, 2700)]:
+            with self.subTest(overtime=overtime):
+                analysis, _ = quiet(analysed_match, overtime=overtime)
+                self.assertEqual(self.team_seconds(analysis), {'Home': 5 * game_length, 'Away': 5 * game_length})
+
+    def test_five_players_all_game_of_synthetic_matches(self):
+        for profile, summary, analysis in synthetic_matches():
+            with self.subTest(profile=profile):
+                game_length = 2400 + 300 * (len(summary['Periods']) - 4)
+                self.assertEqual(self.team_seconds(analysis), {'Home': 5 * game_length, 'Away': 5 * game_length})
+
+    def test_intervals(self):
+        analysis, _ = quiet(analysed_match)
+        df = analysis.get_playtime()
+        intervals = {player: rows[['In', 'Out']].values.tolist() for player, rows in df.groupby('Player')}
+        self.assertEqual(intervals[101], [[0, 300], [1440, 2400]])  # out in the 1st period, back in the 3rd
+        self.assertEqual(intervals[106], [[300, 1440]])
+        self.assertEqual(intervals[205], [[0, 780]])
+        self.assertEqual(intervals[206], [[780, 2400]])
+        self.assertEqual(intervals[102], [[0, 2400]])  # never substituted
+        self.assertEqual(intervals[107], [[0, 0]])  # never played
+        starters = analysis.get_starters()
+        self.assertEqual(sorted(player for player, starter in starters.items() if starter == 'Y'),
+                         [101, 102, 103, 104, 105, 201, 202, 203, 204, 205])
+
+    def test_player_stat(self):
+        analysis, storage = quiet(analysed_match)
+        df = read_table(storage, 'player_stat').set_index('PlayerId')
+        self.assertEqual(df.loc[101, ['Player', 'Points', '2FGM', 'FTM', 'FLS']].tolist(), ['*Player 101', 3, 1, 1, 1])
+        self.assertEqual(df.loc[106, ['Player', 'Points', '3FGA', '2FGA', 'AST']].tolist(), ['Player 106', 3, 1, 1, 0])
+        self.assertEqual(df.loc[102, 'AST'], 1)
+        self.assertEqual(df.loc[203, ['DREB', 'FTM', 'FLS']].tolist(), [1, 1, 1])
+        self.assertEqual(df.groupby('HomeAway').Points.sum().to_dict(), {'Away': 8, 'Home': 10})
+
+
+
+class TestTeamFouls(unittest.TestCase):
+
+    def team_fouls(self, overtime):
+        _, storage = quiet(analysed_match, overtime=overtime)
+        df = read_table(storage, 'team_fouls_per_period')
+        return {(row['Period'], row['HomeAway']): (row['NoFouls'], row['Minute'], row['BonusGameSecond'])
+                for row in df.to_dict(orient='records')}
+
+    def assertFouls(self, actual, expected):
+        self.assertEqual(actual[:2], expected[:2])
+        if expected[2] is None:
+            self.assertTrue(actual[2] != actual[2], actual)  # NaN: the team did not reach the bonus
+        else:
+            self.assertEqual(actual[2], expected[2])
+
+    def test_bonus_follows_4th_team_foul(self):
+        fouls = self.team_fouls(overtime=False)
+        self.assertEqual(len(fouls), 8)
+        self.assertFouls(fouls[(1, 'Home')], (5, '04:10', 250))  # the 4th foul at 04:10, not the 5th
+        self.assertFouls(fouls[(1, 'Away')], (0, '00:00', None))
+        self.assertFouls(fouls[(2, 'Home')], (0, '00:00', None))  # a new period starts from zero
+        self.assertFouls(fouls[(4, 'Home')], (2, '00:00', None))
+        self.assertFouls(fouls[(4, 'Away')], (4, '04:00', 1800 + 240))
+
+    def test_overtime_continues_4th_period(self):
+        fouls = self.team_fouls(overtime=True)
+        self.assertEqual(len(fouls), 10)
+        # two fouls in the 4th period and two in the overtime: the bonus starts at the 2nd foul of the overtime
+        self.assertFouls(fouls[(5, 'Home')], (2, '02:00', 2400 + 120))
+        # four fouls in the 4th period: in the bonus from the start of the overtime
+        self.assertFouls(fouls[(5, 'Away')], (1, '00:00', 2400))
+        self.assertFouls(fouls[(4, 'Away')], (4, '04:00', 2040))
+
+
+if __name__ == '__main__':
+    unittest.main()
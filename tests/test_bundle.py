@@ -0,0 +1,67 @@
+import contextlib
+import io
+import json
+import unittest
+from pandas.testing import assert_frame_equal
+from logic.analysis import Analysis
+from logic.bundle import bundle_key, load_bundles, parse_bundle, read_bundle
+from logic.storage import MemoryStorage
+from logic.utility import Utility
+from match_fixture import fixture_match, read_table, write_match
+
+TABLES = ['match_header', 'cumulative_score', 'assists', 'scoring', 'player_stat', 'team_fouls_per_period',
+          'plus_minus', 'lineup_ratings']
+
+
+def quiet(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = MemoryStorage()
+        write_match(self.storage, 1, *fixture_match(overtime=True))
+
+    def analysis(self, output):
+        return quiet(Analysis, 1, dry_run=False, storage=self.storage, output=output)
+
+    def test_tables_equal_folders(self):
+        quiet(self.analysis('both').run_all_analyses)
+        tables = parse_bundle(self.storage.read(bundle_key(1)))
+        self.assertEqual(sorted(tables), sorted(TABLES))
+        for name in TABLES:
+            with self.subTest(table=name):
+                assert_frame_equal(tables[name], read_table(self.storage, name))
+        loaded = load_bundles(['player_stat', 'match_header'], self.storage)
+        assert_frame_equal(loaded['player_stat'], read_table(self.storage, 'player_stat'))
+
+    def test_version_1_still_read(self):
+        quiet(self.analysis('both').run_all_analyses)
+        rows = {name: [json.loads(line) for line in lines.splitlines()]
+                for name, lines in read_bundle(self.storage.read(bundle_key(1))).items()}
+        body = json.dumps({'Version': 1, 'MatchId': 1, 'CreatedTime': '2020-02-01 20:00:00', 'Tables': rows})
+        tables = parse_bundle(body.encode('utf-8'))
+        for name in TABLES:
+            with self.subTest(table=name):
+                assert_frame_equal(tables[name], read_table(self.storage, name))
+
+    def test_single_analysis_keeps_other_tables(self):
+        quiet(self.analysis('bundle').run_all_analyses)
+        before = read_bundle(self.storage.read(bundle_key(1)))
+
+        utility = quiet(Utility, match_id=1, dry_run=False, storage=self.storage, output='bundle')
+        analysis = quiet(Analysis, 1, dry_run=False, storage=self.storage, utility=utility)
+        quiet(analysis.point_accumulation, 'second')
+        quiet(utility.save_bundle)
+        tables = read_bundle(self.storage.read(bundle_key(1)))
+        self.assertEqual(sorted(tables), sorted(TABLES + ['cumulative_score_second']))
+        self.assertEqual(tables['player_stat'], before['player_stat'])
+
+        quiet(self.analysis('bundle').run_all_analyses)  # a new analysis of the match replaces the bundle
+        self.assertEqual(sorted(read_bundle(self.storage.read(bundle_key(1)))), sorted(TABLES))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+import unittest
+from urllib.parse import parse_qs, urlparse
+from logic.compression import decompress
+from logic.download import BulkDownload, RateLimiter
+from logic.manifest import Manifest
+from logic.storage import MemoryStorage
+
+SUMMARY = {'Date': '2020-01-05T18:00:00', 'Periods': [{'Home': 20, 'Away': 18}], 'HomeTeam': 'Bjørn'}
+EVENTS = {'Events': [{'EventType': 'Score', 'PeriodTime': '00:01:00'}]}
+
+
+def match_page(summary=SUMMARY, events=EVENTS):
+    return ("<html><script>Nif.Basket.MatchSummaryViewModel(" + json.dumps(summary) + ");\n"
+            "Nif.Basket.MatchEventsViewModel(" + json.dumps(events) + ");</script></html>").encode('utf-8')
+
+
+class MatchDetailsHandler(BaseHTTPRequestHandler):
+    """
+    Stand-in for the MatchDetails page: match 1 exists, match 2 does not, match 3 fails with 503 twice first
+    """
+    failures = {}
+    requests = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        match_id = parse_qs(urlparse(self.path).query)['id'][0]
+        with self.lock:
+            self.requests.append(match_id)
+            failures = self.failures.get(match_id, 0)
+            if failures:
+                self.failures[match_id] = failures - 1
+        if failures:
+            self.send_response(503)
+            self.end_headers()
+            return
+        body = b'<html>no match</html>' if match_id == '2' else match_page()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBulkDownload(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), MatchDetailsHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = "http://127.0.0.1:{}/MatchDetails?id=".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        MatchDetailsHandler.failures = {}
+        MatchDetailsHandler.requests = []
+        self.storage = MemoryStorage()
+
+    def download(self, list_match_id, **kwargs):
+        download = BulkDownload(list_match_id, workers=4, requests_per_second=0, backoff=0.01,
+                                base_url=self.base_url, timeout=5, storage=self.storage, **kwargs)
+        download.run()
+        return {result['MatchId']: result for result in download.get_results()}
+
+    def test_ok_and_missing(self):
+        results = self.download([1, 2])
+        self.assertEqual(results[1]['Status'], 'ok')
+        self.assertEqual(results[2]['Status'], 'missing')
+        summary = json.loads(decompress(self.storage.read('blno/STAGING_IN/1_MatchSummaryViewModel.json')))
+        self.assertEqual(summary, SUMMARY)
+        self.assertTrue(self.storage.exists('blno/STAGING_IN/1_MatchEventsViewModel.json'))
+        self.assertFalse(self.storage.list('blno/STAGING_IN/2_'))
+        self.assertEqual(Manifest(storage=self.storage).get_entry(1)['Status'], 'finished')
+
+    def test_retry_after_503(self):
+        MatchDetailsHandler.failures = {'3': 2}
+        results = self.download([3])
+        self.assertEqual(results[3]['Status'], 'ok')
+        self.assertEqual(MatchDetailsHandler.requests, ['3', '3', '3'])
+
+    def test_failed_after_retries(self):
+        MatchDetailsHandler.failures = {'3': 5}
+        results = self.download([3], retries=1)
+        self.assertEqual(results[3]['Status'], 'failed')
+        self.assertIn('503', results[3]['Error'])
+        self.assertIsNone(Manifest(storage=self.storage).get_entry(3))
+
+    def test_finished_match_skipped(self):
+        self.download([1])
+        results = self.download([1])
+        self.assertEqual(results[1]['Status'], 'skipped')
+        self.assertEqual(MatchDetailsHandler.requests, ['1'])
+        results = self.download([1], force=True)
+        self.assertEqual(results[1]['Status'], 'unchanged')
+
+    def test_analysed_before_downloaded(self):
+        manifest = Manifest(storage=self.storage)
+        manifest.mark_analyzed(1)  # e.g. by the season runner, for a match from before the manifest
+        manifest.save()
+        results = self.download([1, 2])
+        self.assertEqual(results[1]['Status'], 'ok')
+        self.assertEqual(results[2]['Status'], 'missing')
+        self.assertTrue(Manifest(storage=self.storage).is_finished(1))
+
+    def test_dry_run(self):
+        results = self.download([1], dry_run=True)
+        self.assertEqual(results[1]['Status'], 'ok')
+        self.assertEqual(self.storage.list('blno/'), [])
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_spaces_requests_per_host(self):
+        limiter = RateLimiter(requests_per_second=20.0)
+        start = time.monotonic()
+        for _ in range(3):
+            limiter.wait('http://a/MatchDetails')
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        start = time.monotonic()
+        limiter.wait('http://b/MatchDetails')
+        self.assertLess(time.monotonic() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import contextlib
+import io
+import unittest
+from logic.analysis import Analysis
+from logic.logic_web import Logic
+from logic.snapshot import CHANGES_KEY
+from logic.storage import MemoryStorage
+from match_fixture import analysed_match, fixture_match, write_match
+
+
+class CountingStorage(MemoryStorage):
+    """
+    MemoryStorage that counts the listings and reads of the web app
+    """
+    def __init__(self):
+        super().__init__()
+        self.listings = 0
+        self.read_keys = []
+
+    def list_versions(self, prefix):
+        self.listings += 1
+        return super().list_versions(prefix)
+
+    def read(self, key):
+        self.read_keys.append(key)
+        return super().read(key)
+
+    def reset(self):
+        self.listings = 0
+        self.read_keys = []
+
+
+def quiet(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+class TestRefresh(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = CountingStorage()
+        quiet(analysed_match, 1, self.storage)
+        quiet(analysed_match, 2, self.storage)
+        self.logic = Logic(storage=self.storage, verbose=False, source='folders')
+        self.assertEqual(self.logic.refresh(), 0)  # the first refresh lists the tables once
+        self.storage.reset()
+
+    def test_unchanged_not_listed(self):
+        for _ in range(3):
+            self.assertEqual(self.logic.refresh(), 0)
+        self.assertEqual((self.storage.listings, self.storage.read_keys), (0, []))
+
+    def test_new_match_swapped_in(self):
+        quiet(analysed_match, 3, self.storage, league='Other League')
+        self.storage.reset()
+        self.assertEqual(self.logic.refresh(), 1)
+        self.assertEqual(sorted(self.storage.read_keys), ['blno/assists/3.json', 'blno/cumulative_score/3.json',
+                                                          'blno/match_header/3.json', 'blno/player_stat/3.json'])
+        self.assertEqual(sorted(self.logic.all_leagues()), ['Other League', 'Test League'])
+        self.assertEqual(self.logic.match_title(3), self.logic.match_title(1))
+
+        self.storage.reset()
+        self.assertEqual(self.logic.refresh(), 0)
+        self.assertEqual(self.storage.listings, 0)
+
+    def test_changed_match_swapped_in(self):
+        title = self.logic.match_title(2)
+        quiet(analysed_match, 1, self.storage, overtime=True, league='Other League')
+        self.storage.reset()
+        self.assertEqual(self.logic.refresh(), 1)
+        self.assertTrue(all(key.endswith('/1.json') for key in self.storage.read_keys))
+        self.assertEqual([match['value'] for match in self.logic.match_list('Other League')], [1])
+        self.assertEqual([match['value'] for match in self.logic.match_list('Test League')], [2])
+        self.assertEqual(self.logic.match_title(2), title)
+
+    def test_saved_without_marker_picked_up_at_next_change(self):
+        write_match(self.storage, 3, *fixture_match())
+        quiet(Analysis(3, dry_run=False, storage=self.storage, output='folders').match_header)
+        self.assertEqual(self.logic.refresh(), 0)
+        quiet(analysed_match, 4, self.storage)
+        self.assertEqual(self.logic.refresh(), 2)
+        self.assertEqual(len(self.logic.match_list('Test League')), 4)
+
+    def test_listed_every_time_without_marker(self):
+        storage = MemoryStorage()
+        write_match(storage, 1, *fixture_match())
+        quiet(Analysis(1, dry_run=False, storage=storage, output='folders').match_header)
+        logic = Logic(storage=storage, verbose=False, source='folders')
+        self.assertFalse(storage.exists(CHANGES_KEY))
+        write_match(storage, 2, *fixture_match())
+        quiet(Analysis(2, dry_run=False, storage=storage, output='folders').match_header)
+        self.assertEqual(logic.refresh(), 1)
+        self.assertEqual(len(logic.match_list('Test League')), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import json
+import unittest
+from logic.manifest import Manifest, match_status
+from logic.storage import MemoryStorage
+
+SUMMARY = json.dumps({'Date': '2020-01-05T18:00:00', 'Periods': [{'HomeGoals': 20, 'AwayGoals': 18}]})
+EVENTS = json.dumps({'Events': []})
+
+
+class TestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.storage = MemoryStorage()
+        self.manifest = Manifest(storage=self.storage)
+        self.view_models = {'MatchSummaryViewModel': SUMMARY, 'MatchEventsViewModel': EVENTS}
+
+    def test_unchanged_view_models_are_skipped(self):
+        changed = self.manifest.changed_view_models(1, self.view_models)
+        self.assertEqual(changed, ['MatchSummaryViewModel', 'MatchEventsViewModel'])
+        self.manifest.commit(1, self.view_models, changed)
+        self.assertEqual(self.manifest.changed_view_models(1, self.view_models), [])
+
+        view_models = dict(self.view_models, MatchEventsViewModel=json.dumps({'Events': [{}]}))
+        self.assertEqual(self.manifest.changed_view_models(1, view_models), ['MatchEventsViewModel'])
+
+    def test_nothing_recorded_before_commit(self):
+        # the files could not be saved: the next run finds the same view models changed
+        self.manifest.changed_view_models(1, self.view_models)
+        self.assertIsNone(self.manifest.get_entry(1))
+        self.assertFalse(self.manifest.is_finished(1))
+        self.assertEqual(len(self.manifest.changed_view_models(1, self.view_models)), 2)
+
+    def test_status_and_analysis(self):
+        self.manifest.commit(1, self.view_models, list(self.view_models))
+        self.assertTrue(self.manifest.is_finished(1))
+        self.assertEqual(self.manifest.get_matches_to_analyze(), [1])
+        self.manifest.mark_analyzed(1)
+        self.assertFalse(self.manifest.needs_analysis(1))
+
+        self.manifest.commit(1, self.view_models, [])  # fetched again, nothing changed
+        self.assertFalse(self.manifest.needs_analysis(1))
+        self.manifest.commit(1, self.view_models, ['MatchEventsViewModel'])
+        self.assertTrue(self.manifest.needs_analysis(1))
+
+    def test_analysed_before_downloaded(self):
+        self.manifest.mark_analyzed(1)
+        self.assertFalse(self.manifest.is_finished(1))
+        self.assertEqual(self.manifest.changed_view_models(1, self.view_models), list(self.view_models))
+        self.manifest.commit(1, self.view_models, list(self.view_models))
+        self.assertTrue(self.manifest.is_finished(1))
+        self.assertTrue(self.manifest.needs_analysis(1))
+
+    def test_saved_and_loaded(self):
+        self.manifest.commit(1, self.view_models, list(self.view_models))
+        self.manifest.save()
+        manifest = Manifest(storage=self.storage)
+        self.assertEqual(manifest.get_entry(1), self.manifest.get_entry(1))
+        self.assertEqual(manifest.changed_view_models(1, self.view_models), [])
+
+    def test_match_status(self):
+        self.assertEqual(match_status({'Date': '2020-01-05T18:00:00', 'Periods': [{}]}), 'finished')
+        self.assertEqual(match_status({'Date': '2020-01-05T18:00:00', 'Periods': []}), 'live')
+        self.assertEqual(match_status({'Date': '2999-01-05T18:00:00', 'Periods': []}), 'scheduled')
+
+
+if __name__ == '__main__':
+    unittest.main()
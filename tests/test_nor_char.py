@@ -0,0 +1,45 @@
+import json
+import re
+import unittest
+from logic.dictionary import Dictionary
+from logic.nor_char import repair_nor_chars
+
+
+class TestRepairNorChars(unittest.TestCase):
+
+    def test_every_replacement(self):
+        for broken, letter in Dictionary.nor_char_replacement.items():
+            with self.subTest(broken=broken):
+                self.assertEqual(repair_nor_chars('Bj' + broken + 'rn'), 'Bj' + letter + 'rn')
+
+    def test_every_replacement_bytes(self):
+        for broken, letter in Dictionary.nor_char_replacement.items():
+            with self.subTest(broken=broken):
+                text = ('Bj' + broken + 'rn').encode('utf-8')
+                self.assertEqual(repair_nor_chars(text), ('Bj' + letter + 'rn').encode('utf-8'))
+
+    def test_json_escapes(self):
+        for broken, letter in Dictionary.nor_char_replacement.items():
+            escaped = json.dumps({'FirstName': 'Bj' + broken + 'rn'}, ensure_ascii=True)
+            upper_hex = re.sub(r'\\u([0-9a-f]{4})', lambda m: '\\u' + m.group(1).upper(), escaped)
+            for text in [escaped, upper_hex]:
+                with self.subTest(text=text):
+                    self.assertEqual(json.loads(repair_nor_chars(text)), {'FirstName': 'Bj' + letter + 'rn'})
+                    self.assertEqual(json.loads(repair_nor_chars(text.encode('utf-8'))),
+                                     {'FirstName': 'Bj' + letter + 'rn'})
+
+    def test_json_text(self):
+        text = json.dumps({'FirstName': 'SÃ¸ren', 'LastName': 'Ã˜deg&#229;rd', 'Team': 'Ã¦ Ã©'}, ensure_ascii=False)
+        expected = {'FirstName': 'Søren', 'LastName': 'Ødegård', 'Team': 'æ é'}
+        self.assertEqual(json.loads(repair_nor_chars(text)), expected)
+        self.assertEqual(json.loads(repair_nor_chars(text.encode('utf-8'))), expected)
+
+    def test_unchanged(self):
+        for text in ['Ola Nordmann', 'Bjørn Ødegård', '\\u00f8', '']:
+            with self.subTest(text=text):
+                self.assertEqual(repair_nor_chars(text), text)
+                self.assertEqual(repair_nor_chars(text.encode('utf-8')), text.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import contextlib
+import io
+import unittest
+from logic.season import SeasonAggregates
+from logic.storage import MemoryStorage
+from match_fixture import analysed_match
+
+
+def player_stat(match_id=1, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        analysis, _ = analysed_match(match_id=match_id, **kwargs)
+    return analysis.get_player_stat()
+
+
+class TestSeasonAggregates(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.df = player_stat()
+        cls.df_overtime = player_stat(overtime=True)
+
+    def setUp(self):
+        self.storage = MemoryStorage()
+        self.season = SeasonAggregates(storage=self.storage, top_n=3)
+
+    def totals(self, league='Test League'):
+        return self.season.get_player_totals(league).set_index('PlayerId')
+
+    def test_one_match(self):
+        self.season.update(1, 'Test League', self.df)
+        totals = self.totals()
+        self.assertEqual(len(totals), len(self.df))
+        self.assertEqual(totals.loc[101, ['Player', 'Games', 'Points', 'FTM', 'Seconds']].tolist(),
+                         ['Player 101', 1, 3, 1, 1260])
+        self.assertEqual(totals.Points.sum(), 18)
+        board = self.season.get_leaderboard('Test League', 'Points')
+        self.assertEqual([row['Value'] for row in board], [3, 3, 3])
+        self.assertEqual(len(self.season.get_leaderboard('Test League', 'Points', per_game=True)), 3)
+
+    def test_match_replaced_not_counted_twice(self):
+        self.season.update(1, 'Test League', self.df)
+        once = self.totals()
+        self.season.update(1, 'Test League', self.df)
+        self.assertTrue(self.totals().equals(once))
+
+        self.season.update(1, 'Test League', self.df_overtime)  # analysed again with more data
+        totals = self.totals()
+        self.assertEqual(totals.Games.max(), 1)
+        self.assertEqual(totals.loc[102, 'Seconds'], 2700)
+        self.assertEqual(self.season.get_match_ids(), [1])
+
+    def test_two_matches(self):
+        self.season.update(1, 'Test League', self.df)
+        self.season.update(2, 'Test League', self.df_overtime)
+        totals = self.totals()
+        self.assertEqual(totals.loc[102, ['Games', 'Seconds', 'SecondsPerGame']].tolist(), [2, 5100, 2550])
+        self.assertEqual(totals.Points.sum(), 36)
+        self.season.remove(2)
+        self.assertTrue(self.totals().Games.eq(1).all())
+        self.assertEqual(self.totals().loc[102, 'Seconds'], 2400)
+
+    def test_league_changed(self):
+        self.season.update(1, 'Test League', self.df)
+        self.season.update(1, 'Other League', self.df)
+        self.assertTrue(self.totals().empty)
+        self.assertEqual(self.season.get_leaderboard('Test League', 'Points'), [])
+        self.assertEqual(len(self.totals('Other League')), len(self.df))
+
+    def test_saved_and_loaded(self):
+        self.season.update(1, 'Test League', self.df)
+        self.season.save()
+        season = SeasonAggregates(storage=self.storage, top_n=3)
+        self.assertEqual(season.get_leaderboard('Test League', 'REB'),
+                         self.season.get_leaderboard('Test League', 'REB'))
+        season.update(1, 'Test League', self.df)
+        self.assertEqual(season.get_player_totals('Test League').Games.max(), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
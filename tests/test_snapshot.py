@@ -0,0 +1,85 @@
+import contextlib
+import io
+import json
+import unittest
+from unittest import mock
+from pandas.testing import assert_frame_equal
+from logic.compression import compress
+from logic.snapshot import (load_folder, read_json_files, read_snapshot, rebuild_snapshots, snapshot_key,
+                            update_snapshots)
+from match_fixture import analysed_match, read_table
+
+# rows of match 2 written before the game clock was kept in integer minutes
+OLD_CUMULATIVE_SCORE = [
+    {'Minute': '1900-01-01 00:00:00', 'Home': 0, 'Away': 0, 'MinuteRound': '00', 'Difference': 0, 'MatchId': 2},
+    {'Minute': '1900-01-01T00:12:00.000Z', 'Home': 4, 'Away': 2, 'MinuteRound': '00', 'Difference': 2,
+     'MatchId': 2},
+    {'Minute': '1900-01-01 01:05:00', 'Home': 90, 'Away': 80, 'MinuteRound': '00', 'Difference': 10,
+     'MatchId': 2},
+]
+OLD_ASSISTS = [
+    {'Assist': 'Player 102', 'PeriodName': '1. periode', 'HomeAway': 'Home', 'MinuteRound': '01--2208988740',
+     'PlayerId': 101, 'Scorer': 'Player 101', 'Point': 2, 'Team': 'Home', 'Starter': 'Y', 'MatchId': 2},
+]
+
+
+def quiet(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def write_rows(storage, folder, match_id, rows):
+    body, _ = compress('\n'.join(json.dumps(row) for row in rows).encode('utf-8'))
+    storage.write('blno/{}/{}.json'.format(folder, match_id), body)
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        _, self.storage = quiet(analysed_match)
+        write_rows(self.storage, 'cumulative_score', 2, OLD_CUMULATIVE_SCORE)
+        write_rows(self.storage, 'assists', 2, OLD_ASSISTS)
+
+    def test_old_clock_read_as_minutes(self):
+        df = read_table(self.storage, 'cumulative_score', match_id=2)
+        self.assertEqual(df.Minute.tolist(), [0, 12, 65])
+        self.assertEqual(df.MinuteRound.tolist(), [0, 12, 65])
+        self.assertEqual(read_table(self.storage, 'assists', match_id=2).MinuteRound.tolist(), [1])
+
+    def test_mixed_folder_written(self):
+        self.assertEqual(quiet(rebuild_snapshots, self.storage), [])
+        for folder in ['cumulative_score', 'assists']:
+            with self.subTest(folder=folder):
+                df = quiet(load_folder, folder, self.storage)
+                self.assertEqual(sorted(df.MatchId.unique()), [1, 2])
+                self.assertEqual(df.MinuteRound.dtype, 'int64')
+                assert_frame_equal(df.loc[df.MatchId == 1].reset_index(drop=True),
+                                   read_table(self.storage, folder))
+
+        write_rows(self.storage, 'cumulative_score', 2, OLD_CUMULATIVE_SCORE[:2])  # downloaded again
+        self.assertEqual(quiet(update_snapshots, [2], self.storage), [])
+        df, _ = read_snapshot('cumulative_score', self.storage)
+        self.assertEqual(df.loc[df.MatchId == 2, 'Minute'].tolist(), [0, 12])
+
+    def test_other_text_kept(self):
+        write_rows(self.storage, 'cumulative_score', 3, [dict(OLD_CUMULATIVE_SCORE[0], Minute='04:10', MatchId=3)])
+        self.assertEqual(quiet(rebuild_snapshots, self.storage, ['cumulative_score']), [])
+        df, _ = read_snapshot('cumulative_score', self.storage)
+        self.assertEqual(df.loc[df.MatchId == 3, 'Minute'].tolist(), ['04:10'])
+        self.assertEqual(df.loc[df.MatchId == 2, 'Minute'].tolist(), ['0', '12', '65'])
+
+    def test_failed_folder_does_not_stop_others(self):
+        def failing(keys, storage, workers=16):
+            if any('/assists/' in key for key in keys):
+                raise ValueError('broken file')
+            return read_json_files(keys, storage, workers)
+
+        with mock.patch('logic.snapshot.read_json_files', side_effect=failing):
+            self.assertEqual(quiet(rebuild_snapshots, self.storage), ['assists'])
+        self.assertFalse(self.storage.exists(snapshot_key('assists')))
+        for folder in ['match_header', 'player_stat', 'cumulative_score']:
+            self.assertTrue(self.storage.exists(snapshot_key(folder)))
+
+
+if __name__ == '__main__':
+    unittest.main()
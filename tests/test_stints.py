@@ -0,0 +1,78 @@
+import contextlib
+import io
+import unittest
+import pandas as pd
+from benchmarks.synthetic import PROFILES, match
+from logic.analysis import Analysis
+from logic.stints import season_plus_minus
+from logic.storage import MemoryStorage
+from match_fixture import analysed_match, write_match
+
+
+def quiet(function, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args, **kwargs)
+
+
+def fixture_stints(overtime=False):
+    analysis, _ = quiet(analysed_match, overtime=overtime)
+    return analysis.get_stints()
+
+
+class TestStints(unittest.TestCase):
+
+    def assertAddsUp(self, stints, home, away, game_length):
+        df = stints.get_stints()
+        self.assertEqual(df.Start.iloc[0], 0)
+        self.assertEqual(df.End.iloc[-1], game_length)
+        self.assertTrue((df.End.iloc[:-1].to_numpy() == df.Start.iloc[1:].to_numpy()).all())  # no gaps
+        self.assertEqual([df.HomePoints.sum(), df.AwayPoints.sum()], [home, away])
+        self.assertTrue(df.HomeLineup.map(len).eq(5).all() and df.AwayLineup.map(len).eq(5).all())
+
+        plus_minus = stints.plus_minus().groupby('HomeAway')
+        # five players of a team on the court in every stint
+        self.assertEqual(plus_minus.PlusMinus.sum().to_dict(), {'Home': 5 * (home - away), 'Away': 5 * (away - home)})
+        self.assertEqual(plus_minus.Seconds.sum().to_dict(), {'Home': 5 * game_length, 'Away': 5 * game_length})
+        ratings = stints.lineup_ratings().groupby('HomeAway')
+        self.assertEqual(ratings.PlusMinus.sum().to_dict(), {'Home': home - away, 'Away': away - home})
+        self.assertEqual(ratings.Seconds.sum().to_dict(), {'Home': game_length, 'Away': game_length})
+
+    def test_fixture_adds_up_to_final_score(self):
+        for overtime, game_length in [(False, 2400), (True, 2700)]:
+            with self.subTest(overtime=overtime):
+                self.assertAddsUp(fixture_stints(overtime), 10, 8, game_length)
+
+    def test_synthetic_matches_add_up_to_final_score(self):
+        storage = MemoryStorage()
+        for match_id, profile in enumerate(PROFILES, start=1):
+            summary, data = match(match_id, seed=5, **PROFILES[profile])
+            write_match(storage, match_id, summary, data)
+            with self.subTest(profile=profile):
+                stints = quiet(Analysis, match_id, dry_run=True, storage=storage).get_stints()
+                game_length = 2400 + 300 * (len(summary['Periods']) - 4)
+                self.assertAddsUp(stints, summary['HomeGoals'], summary['AwayGoals'], game_length)
+
+    def test_plus_minus(self):
+        df = fixture_stints().plus_minus().set_index('Player')
+        self.assertEqual(df.loc[101, ['Seconds', 'PointsFor', 'PointsAgainst', 'PlusMinus']].tolist(), [1260, 5, 4, 1])
+        # the free throws right after the substitution at 05:00 count for the lineup with 106
+        self.assertEqual(df.loc[106, ['Seconds', 'PointsFor', 'PointsAgainst', 'PlusMinus']].tolist(), [1140, 5, 4, 1])
+        self.assertEqual(df.loc[205, ['Seconds', 'PlusMinus']].tolist(), [780, 0])
+        self.assertNotIn(107, df.index)
+
+    def test_on_court(self):
+        stints = fixture_stints()
+        self.assertEqual(stints.on_court(0), {'Home': (101, 102, 103, 104, 105), 'Away': (201, 202, 203, 204, 205)})
+        self.assertEqual(stints.on_court(300)['Home'], (102, 103, 104, 105, 106))
+        self.assertEqual(stints.on_court(1000), {'Home': (102, 103, 104, 105, 106), 'Away': (201, 202, 203, 204, 206)})
+        self.assertEqual(stints.on_court(2399)['Home'], (101, 102, 103, 104, 105))
+
+    def test_season_plus_minus(self):
+        df = pd.concat([fixture_stints().plus_minus(),
+                        fixture_stints(overtime=True).plus_minus().assign(MatchId=2)], ignore_index=True)
+        season = season_plus_minus(df).set_index('Player')
+        self.assertEqual(season.loc[102, ['Matches', 'Seconds', 'PlusMinus']].tolist(), [2, 5100, 4])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import tempfile
+import unittest
+from unittest import mock
+import boto3
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+from logic.storage import CachedStorage, LocalStorage, MemoryStorage, S3Storage
+
+KEY = 'blno/STAGING_IN/1_MatchEventsViewModel.json'
+
+
+class CountingStorage(MemoryStorage):
+    """
+    MemoryStorage that counts the requests a cache in front of it makes
+    """
+    def __init__(self):
+        super().__init__()
+        self.reads = 0
+        self.versions = 0
+
+    def read(self, key):
+        self.reads += 1
+        return super().read(key)
+
+    def version(self, key):
+        self.versions += 1
+        return super().version(key)
+
+
+class TestCachedStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.backend = CountingStorage()
+        self.backend.write(KEY, b'first')
+        self.clock = mock.patch('logic.storage.time.time', return_value=1000.0)
+        self.time = self.clock.start()
+
+    def tearDown(self):
+        self.clock.stop()
+        self.directory.cleanup()
+
+    def cache(self, ttl=60):
+        return CachedStorage(self.backend, self.directory.name, ttl=ttl)
+
+    def test_copy_used_without_requests_within_ttl(self):
+        self.assertEqual(self.cache().read(KEY), b'first')
+        self.assertEqual((self.backend.reads, self.backend.versions), (1, 1))
+        self.time.return_value = 1059.0
+        for _ in range(3):
+            self.assertEqual(self.cache().read(KEY), b'first')  # also a new process sharing the directory
+        self.assertEqual((self.backend.reads, self.backend.versions), (1, 1))
+
+    def test_copy_checked_after_ttl(self):
+        cache = self.cache()
+        cache.read(KEY)
+        self.time.return_value = 1061.0
+        self.assertEqual(cache.read(KEY), b'first')  # same version: checked, not downloaded
+        self.assertEqual((self.backend.reads, self.backend.versions), (1, 2))
+        self.time.return_value = 1100.0
+        cache.read(KEY)  # checked again at 1061
+        self.assertEqual(self.backend.versions, 2)
+
+        self.backend.write(KEY, b'second')  # written by someone else, e.g. a download on another machine
+        self.time.return_value = 1122.0
+        self.assertEqual(cache.read(KEY), b'second')
+        self.assertEqual((self.backend.reads, self.backend.versions), (2, 3))
+
+    def test_ttl_zero_checks_every_read(self):
+        cache = self.cache(ttl=0)
+        cache.read(KEY)
+        self.backend.write(KEY, b'second')
+        self.assertEqual(cache.read(KEY), b'second')
+        self.assertEqual(cache.read(KEY), b'second')
+        self.assertEqual((self.backend.reads, self.backend.versions), (2, 3))
+
+    def test_written_through(self):
+        cache = self.cache()
+        cache.write(KEY, b'second')
+        self.assertEqual(self.backend.read(KEY), b'second')
+        self.backend.reads = 0
+        self.assertEqual(cache.read(KEY), b'second')
+        self.assertEqual(self.backend.reads, 0)
+
+    def test_other_prefixes_not_cached(self):
+        self.backend.write('blno/player_stat/1.json', b'rows')
+        cache = self.cache()
+        cache.read('blno/player_stat/1.json')
+        cache.read('blno/player_stat/1.json')
+        self.assertEqual(self.backend.reads, 2)
+        self.assertEqual(LocalStorage(self.directory.name).list('blno/'), [])
+
+
+class TestS3Exists(unittest.TestCase):
+
+    def setUp(self):
+        client = boto3.client('s3', region_name='eu-north-1', aws_access_key_id='test', aws_secret_access_key='test')
+        self.stubber = Stubber(client)
+        self.stubber.activate()
+        self.storage = S3Storage(bucket_name='hubie', client=client)
+
+    def tearDown(self):
+        self.stubber.deactivate()
+
+    def test_exists(self):
+        self.stubber.add_response('head_object', {'ETag': '"abc"'}, {'Bucket': 'hubie', 'Key': KEY})
+        self.assertTrue(self.storage.exists(KEY))
+
+    def test_missing(self):
+        self.stubber.add_client_error('head_object', service_error_code='404', http_status_code=404)
+        self.assertFalse(self.storage.exists(KEY))
+
+    def test_other_errors_raised(self):
+        for code, status in [('403', 403), ('SlowDown', 503)]:
+            with self.subTest(code=code):
+                self.stubber.add_client_error('head_object', service_error_code=code, http_status_code=status)
+                with self.assertRaises(ClientError):
+                    self.storage.exists(KEY)
+
+
+if __name__ == '__main__':
+    unittest.main()